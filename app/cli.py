@@ -0,0 +1,44 @@
+import argparse
+import json
+import sys
+from typing import Optional, Sequence
+
+from app.services.users import user_store
+
+
+def _ensure_roles(args: argparse.Namespace) -> int:
+    report = user_store.ensure_roles(chunk_size=args.chunk_size)
+    print(
+        json.dumps(
+            {
+                "rows_updated": report.rows_updated,
+                "chunks": report.chunks,
+                "duration_seconds": round(report.duration_seconds, 3),
+            }
+        )
+    )
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure_roles = commands.add_parser(
+        "ensure-roles",
+        help="Reconcile role, seed profile and phone flags on existing users",
+    )
+    ensure_roles.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Users per transaction (default: ENSURE_ROLES_CHUNK_SIZE)",
+    )
+    ensure_roles.set_defaults(handler=_ensure_roles)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,22 @@ def _env_bool(name: str, default: bool = False) -> bool:
 
 @dataclass(frozen=True)
 class Settings:
+    database_async: bool = _env_bool("DATABASE_ASYNC", False)
+    # SQLAlchemy pool for each engine (sync, and async when enabled).
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Seconds before a connection is replaced; -1 disables.
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+    # "pre_ping" (every checkout), "idle" (after DB_POOL_IDLE_PING_SECONDS idle) or "off"
+    db_pool_liveness: str = os.getenv("DB_POOL_LIVENESS", "pre_ping").strip().lower()
+    db_pool_idle_ping_seconds: float = float(os.getenv("DB_POOL_IDLE_PING_SECONDS", "30"))
+    # Per-request SQL tracing: Server-Timing header, statements slower than
+    # DB_SLOW_QUERY_MS logged with their call site, and requests running more
+    # than DB_TRACE_QUERY_WARN statements logged (0 disables either log).
+    db_trace_enabled: bool = _env_bool("DB_TRACE_ENABLED", True)
+    db_slow_query_ms: float = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    db_trace_query_warn: int = int(os.getenv("DB_TRACE_QUERY_WARN", "25"))
     jwt_secret: str = os.getenv("JWT_SECRET", "")
     jwt_algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(
@@ -23,9 +39,64 @@ class Settings:
     refresh_token_expire_days: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
     otp_length: int = int(os.getenv("OTP_LENGTH", "6"))
     otp_ttl_seconds: int = int(os.getenv("OTP_TTL_SECONDS", "300"))
+    otp_backend: str = os.getenv("OTP_BACKEND", "postgres").strip().lower()
+    otp_memory_shards: int = int(os.getenv("OTP_MEMORY_SHARDS", "16"))
     otp_debug: bool = _env_bool("OTP_DEBUG", False)
     require_onboarding_otp: bool = _env_bool("REQUIRE_ONBOARDING_OTP", False)
     session_ttl_seconds: int = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+    session_cache_size: int = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+    session_cache_ttl_seconds: int = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+    # "startup" (blocking), "background" or "off" (run `python -m app.cli ensure-roles`)
+    ensure_roles_mode: str = os.getenv("ENSURE_ROLES_MODE", "background").strip().lower()
+    ensure_roles_chunk_size: int = int(os.getenv("ENSURE_ROLES_CHUNK_SIZE", "5000"))
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    user_page_cache_size: int = int(os.getenv("USER_PAGE_CACHE_SIZE", "256"))
+    user_cache_ttl_seconds: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    user_search_backend: str = os.getenv("USER_SEARCH_BACKEND", "memory").strip().lower()
+    user_search_rebuild_seconds: int = int(os.getenv("USER_SEARCH_REBUILD_SECONDS", "300"))
+    # Prometheus text format at GET /metrics, per worker process.
+    metrics_enabled: bool = _env_bool("METRICS_ENABLED", True)
+    # Responses at least this many bytes are gzip-compressed; 0 disables.
+    gzip_minimum_size: int = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+    users_page_size: int = int(os.getenv("USERS_PAGE_SIZE", "100"))
+    users_page_max: int = int(os.getenv("USERS_PAGE_MAX", "500"))
+    users_export_chunk_size: int = int(os.getenv("USERS_EXPORT_CHUNK_SIZE", "1000"))
+    users_bulk_max_rows: int = int(os.getenv("USERS_BULK_MAX_ROWS", "5000"))
+    users_bulk_chunk_size: int = int(os.getenv("USERS_BULK_CHUNK_SIZE", "500"))
+    users_bulk_max_bytes: int = int(os.getenv("USERS_BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+    rate_limit_enabled: bool = _env_bool("RATE_LIMIT_ENABLED", True)
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+    rate_limit_max_keys: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    rate_limit_trust_forwarded: bool = _env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+    # Trusted proxies in front of the app, each appending to X-Forwarded-For.
+    rate_limit_forwarded_hops: int = int(os.getenv("RATE_LIMIT_FORWARDED_HOPS", "1"))
+    # "<requests>/<seconds>" per bucket
+    rate_limit_otp_request_identifier: str = os.getenv(
+        "RATE_LIMIT_OTP_REQUEST_IDENTIFIER", "5/300"
+    )
+    rate_limit_otp_request_ip: str = os.getenv("RATE_LIMIT_OTP_REQUEST_IP", "20/60")
+    rate_limit_otp_verify_identifier: str = os.getenv(
+        "RATE_LIMIT_OTP_VERIFY_IDENTIFIER", "10/300"
+    )
+    rate_limit_otp_verify_ip: str = os.getenv("RATE_LIMIT_OTP_VERIFY_IP", "60/60")
+    cleanup_enabled: bool = _env_bool("CLEANUP_ENABLED", True)
+    cleanup_interval_seconds: int = int(os.getenv("CLEANUP_INTERVAL_SECONDS", "60"))
+    cleanup_batch_size: int = int(os.getenv("CLEANUP_BATCH_SIZE", "1000"))
+    cleanup_batch_pause_seconds: float = float(
+        os.getenv("CLEANUP_BATCH_PAUSE_SECONDS", "0.1")
+    )
+    otp_delivery_workers: int = int(os.getenv("OTP_DELIVERY_WORKERS", "4"))
+    otp_delivery_queue_size: int = int(os.getenv("OTP_DELIVERY_QUEUE_SIZE", "1000"))
+    otp_delivery_max_attempts: int = int(os.getenv("OTP_DELIVERY_MAX_ATTEMPTS", "3"))
+    otp_delivery_backoff_seconds: float = float(
+        os.getenv("OTP_DELIVERY_BACKOFF_SECONDS", "1")
+    )
+    otp_delivery_backoff_max_seconds: float = float(
+        os.getenv("OTP_DELIVERY_BACKOFF_MAX_SECONDS", "30")
+    )
+    otp_delivery_status_retention: int = int(
+        os.getenv("OTP_DELIVERY_STATUS_RETENTION", "10000")
+    )
     otp_email_sender: str = (
         os.getenv("OTP_EMAIL_SENDER")
         or os.getenv("GMAIL_SENDER")
@@ -40,10 +111,18 @@ class Settings:
         "TWILIO_PHONE_NUMBER", os.getenv("PHONE_NUMBER", "")
     )
     default_country_code: str = os.getenv("DEFAULT_COUNTRY_CODE", "+1")
+    http_pool_size: int = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    http_timeout_seconds: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+    http_idle_timeout_seconds: float = float(
+        os.getenv("HTTP_IDLE_TIMEOUT_SECONDS", "60")
+    )
     gmail_token_file: str = os.getenv("GMAIL_TOKEN_FILE", "")
     gmail_credentials_file: str = os.getenv(
         "GMAIL_CREDENTIALS_FILE", os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE", "")
     )
+    gmail_token_refresh_margin_seconds: int = int(
+        os.getenv("GMAIL_TOKEN_REFRESH_MARGIN_SECONDS", "300")
+    )
     seed_email: str = os.getenv("SEED_EMAIL", "").strip().lower()
     seed_first_name: str = os.getenv("SEED_FIRST_NAME", "").strip()
     seed_last_name: str = os.getenv("SEED_LAST_NAME", "").strip()
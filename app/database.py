@@ -1,8 +1,19 @@
 import os
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Optional, TypeVar
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.metrics import instrument_engine
+from app.pool import PoolMonitor
+from app.tracing import QueryTracer
+
+T = TypeVar("T")
 
 
 def _build_database_url() -> str:
@@ -16,10 +27,31 @@ DATABASE_URL = _build_database_url()
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not configured")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
+def _pool_monitor() -> PoolMonitor:
+    return PoolMonitor(
+        settings.db_max_overflow,
+        settings.db_pool_liveness,
+        settings.db_pool_idle_ping_seconds,
+    )
+
+
+def _pool_options(monitor: PoolMonitor, base: type[Pool]) -> dict[str, Any]:
+    return dict(
+        poolclass=monitor.pool_class(base),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=monitor.pre_ping,
+    )
+
+
+query_tracer = QueryTracer(settings.db_slow_query_ms)
+pool_monitor = _pool_monitor()
+engine = create_engine(DATABASE_URL, **_pool_options(pool_monitor, QueuePool))
+pool_monitor.attach(engine)
+instrument_engine(engine)
+query_tracer.attach(engine)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -28,12 +60,38 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+# With DATABASE_ASYNC enabled the request path talks to Postgres through
+# psycopg's async driver instead of borrowing a threadpool slot per call.
+async_pool_monitor = _pool_monitor() if settings.database_async else None
+async_engine = (
+    create_async_engine(
+        DATABASE_URL, **_pool_options(async_pool_monitor, AsyncAdaptedQueuePool)
+    )
+    if async_pool_monitor is not None
+    else None
+)
+if async_engine is not None:
+    async_pool_monitor.attach(async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine)
+    query_tracer.attach(async_engine.sync_engine)
+
+AsyncSessionLocal = (
+    async_sessionmaker(
+        bind=async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+    if async_engine is not None
+    else None
+)
+
 Base = declarative_base()
 
 
 def init_db() -> None:
     # Import models ONLY so SQLAlchemy knows them
     from app.models import otp as _otp  # noqa: F401
+    from app.models import rate_limit as _rate_limit  # noqa: F401
     from app.models import session as _session  # noqa: F401
     from app.models import user as _user  # noqa: F401
 
@@ -45,7 +103,11 @@ def init_db() -> None:
 
 
 @contextmanager
-def session_scope():
+def session_scope(session: Optional[Session] = None):
+    if session is not None:
+        # Caller owns the transaction; just join it.
+        yield session
+        return
     session = SessionLocal()
     try:
         yield session
@@ -55,3 +117,107 @@ def session_scope():
         raise
     finally:
         session.close()
+
+
+@asynccontextmanager
+async def async_session_scope():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("DATABASE_ASYNC is not enabled")
+    session: AsyncSession = AsyncSessionLocal()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def after_commit(session: Session, callback: Callable[[], None]) -> None:
+    # Runs callback once the session's outermost transaction commits; right
+    # away if it already has (session_scope owned and committed it).
+    if not session.in_transaction():
+        callback()
+        return
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+def after_rollback(session: Session, callback: Callable[[], None]) -> None:
+    if session.in_transaction():
+        session.info.setdefault("after_rollback", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    session.info.pop("after_rollback", None)
+    for callback in session.info.pop("after_commit", ()):
+        callback()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _run_after_rollback(session: Session, transaction: Any) -> None:
+    if transaction.parent is not None:
+        return
+    session.info.pop("after_commit", None)
+    for callback in session.info.pop("after_rollback", ()):
+        callback()
+
+
+class UnitOfWork:
+    # One session and transaction shared by everything a request does (see
+    # app.dependencies.get_db). The session is opened on first use, so
+    # requests answered from caches never check out a connection.
+    def __init__(self) -> None:
+        self._session: Optional[Session] = None
+        self._async_session: Optional[AsyncSession] = None
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if AsyncSessionLocal is None:
+            if self._session is None:
+                self._session = SessionLocal()
+            return await run_in_threadpool(fn, *args, session=self._session, **kwargs)
+        if self._async_session is None:
+            self._async_session = AsyncSessionLocal()
+        return await self._async_session.run_sync(
+            lambda sync_session: fn(*args, session=sync_session, **kwargs)
+        )
+
+    async def commit(self) -> None:
+        if self._session is not None:
+            await run_in_threadpool(self._session.commit)
+        elif self._async_session is not None:
+            await self._async_session.commit()
+
+    async def rollback(self) -> None:
+        if self._session is not None:
+            await run_in_threadpool(self._session.rollback)
+        elif self._async_session is not None:
+            await self._async_session.rollback()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await run_in_threadpool(self._session.close)
+        elif self._async_session is not None:
+            await self._async_session.close()
+        self._session = self._async_session = None
+
+
+async def run_db(
+    fn: Callable[..., T],
+    *args: Any,
+    db: Optional[UnitOfWork] = None,
+    **kwargs: Any,
+) -> T:
+    # fn is a store method taking an optional ``session`` keyword. With a
+    # request's UnitOfWork it joins that session. Otherwise, in async mode it
+    # runs inside an AsyncSession via run_sync (no thread hop), or on the
+    # threadpool with its own session_scope.
+    if db is not None:
+        return await db.run(fn, *args, **kwargs)
+    if AsyncSessionLocal is None:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    async with async_session_scope() as session:
+        return await session.run_sync(
+            lambda sync_session: fn(*args, session=sync_session, **kwargs)
+        )
@@ -0,0 +1,39 @@
+from typing import Annotated, AsyncIterator
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.database import UnitOfWork
+from app.services.rate_limit import RateLimitExceeded, client_ip, otp_rate_limiter
+
+
+async def get_db() -> AsyncIterator[UnitOfWork]:
+    db = UnitOfWork()
+    try:
+        yield db
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+# scope="function" commits before the response is sent, so a failed commit
+# is still reported as a 500. Always declare it through this alias: the
+# scope is part of FastAPI's dependency cache key.
+DbSession = Annotated[UnitOfWork, Depends(get_db, scope="function")]
+
+
+async def enforce_otp_rate_limit(
+    request: Request, action: str, identifier: str, purpose: str
+) -> None:
+    # Deliberately outside the request's UnitOfWork: a 429 rolls that back,
+    # which must not undo the counter.
+    try:
+        await otp_rate_limiter.enforce(client_ip(request), action, identifier, purpose)
+    except RateLimitExceeded as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
@@ -1,11 +1,29 @@
+import asyncio
+import logging
+from typing import Optional
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, health, users
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+
+from app.routers import auth, diagnostics, health, metrics, users
 from app.config import settings
 from app.database import init_db
-from app.services.users import user_store
+from app.metrics import MetricsMiddleware
+from app.tracing import ServerTimingMiddleware
+from app.services.cleanup import expired_row_reaper
+from app.services.delivery import otp_delivery_queue
+from app.services.http import http_client
+from app.services.users import EnsureRolesReport, user_store
 
 app = FastAPI(title="FastAPI Backend")
+LOGGER = logging.getLogger(__name__)
+_ENSURE_ROLES_MODES = {"startup", "background", "off"}
+_ensure_roles_task: Optional[asyncio.Task] = None
+_search_index_task: Optional[asyncio.Task] = None
+_SEARCH_INDEX_POLL_SECONDS = 1.0
+_SEARCH_INDEX_RETRY_SECONDS = 30.0
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,22 +35,90 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+if settings.gzip_minimum_size > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+if settings.db_trace_enabled:
+    app.add_middleware(
+        ServerTimingMiddleware, query_warn=settings.db_trace_query_warn
+    )
+if settings.metrics_enabled:
+    # Added last so it is outermost and times the whole middleware stack.
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
 
 app.include_router(health.router, prefix="/api")
+app.include_router(diagnostics.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 
 
+def _log_ensure_roles(report: EnsureRolesReport) -> None:
+    LOGGER.info(
+        "ensure_roles rows_updated=%s chunks=%s duration=%.3fs",
+        report.rows_updated,
+        report.chunks,
+        report.duration_seconds,
+    )
+
+
+async def _ensure_roles_in_background() -> None:
+    try:
+        _log_ensure_roles(await run_in_threadpool(user_store.ensure_roles))
+    except Exception:
+        LOGGER.exception("ensure_roles failed")
+
+
+async def _maintain_search_index() -> None:
+    # Builds the in-memory search index at startup and rebuilds it when it
+    # goes stale; requests keep using the previous index meanwhile.
+    while True:
+        delay = _SEARCH_INDEX_POLL_SECONDS
+        if user_store.search_index_needs_rebuild():
+            try:
+                await run_in_threadpool(user_store.rebuild_search_index)
+            except Exception:
+                LOGGER.exception("User search index rebuild failed")
+                delay = _SEARCH_INDEX_RETRY_SECONDS
+        await asyncio.sleep(delay)
+
+
 @app.on_event("startup")
 def startup() -> None:
+    if settings.ensure_roles_mode not in _ENSURE_ROLES_MODES:
+        raise RuntimeError(f"Unknown ENSURE_ROLES_MODE: {settings.ensure_roles_mode}")
     init_db()
     if settings.seed_email:
         try:
             user_store.ensure_user_for_identifier(settings.seed_email)
         except ValueError:
             pass
-    user_store.ensure_roles()
+    if settings.ensure_roles_mode == "startup":
+        _log_ensure_roles(user_store.ensure_roles())
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    global _ensure_roles_task, _search_index_task
+    await otp_delivery_queue.start()
+    if settings.cleanup_enabled:
+        expired_row_reaper.start()
+    if settings.ensure_roles_mode == "background":
+        _ensure_roles_task = asyncio.create_task(_ensure_roles_in_background())
+    if settings.user_search_backend == "memory":
+        _search_index_task = asyncio.create_task(_maintain_search_index())
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks() -> None:
+    for task in (_ensure_roles_task, _search_index_task):
+        if task is not None and not task.done():
+            task.cancel()
+    await expired_row_reaper.stop()
+    await otp_delivery_queue.stop()
+    http_client.close()
+
 
 @app.get("/")
 def root():
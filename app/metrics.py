@@ -0,0 +1,303 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# A small in-process implementation of the Prometheus text format (0.0.4);
+# every worker exposes its own numbers at /metrics.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Registry = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def labels(self, *values: object) -> "_Child":
+        if len(values) != len(self._labelnames):
+            raise ValueError(f"{self.name} expects labels {self._labelnames}")
+        return _Child(self, tuple(str(value) for value in values))
+
+    def _label_text(self, values: tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self._labelnames, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class _Child:
+    # Bound label values; forwards to the parent metric.
+    def __init__(self, metric: _Metric, values: tuple[str, ...]) -> None:
+        self._metric = metric
+        self._values = values
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._metric._inc(self._values, amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._metric._inc(self._values, -amount)
+
+    def set(self, value: float) -> None:
+        self._metric._set(self._values, value)
+
+    def observe(self, value: float) -> None:
+        self._metric._observe(self._values, value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._inc((), amount)
+
+    def _inc(self, values: tuple[str, ...], amount: float) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{self._label_text(values)} {_number(value)}"
+            for values, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._inc((), -amount)
+
+    def set(self, value: float) -> None:
+        self._set((), value)
+
+    def _set(self, values: tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = HTTP_BUCKETS,
+        registry: Registry = REGISTRY,
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float) -> None:
+        self._observe((), value)
+
+    def _observe(self, values: tuple[str, ...], value: float) -> None:
+        with self._lock:
+            state = self._values.get(values)
+            if state is None:
+                # per-bucket (non-cumulative) counts + [+Inf], then sum
+                state = self._values[values] = [[0] * (len(self._buckets) + 1), 0.0]
+            counts = state[0]
+            for index, bound in enumerate(self._buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(
+                (values, (list(state[0]), state[1]))
+                for values, state in self._values.items()
+            )
+        lines = []
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self._buckets, math.inf), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == math.inf else f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{self._label_text(values, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed", ("operation",))
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "SQL statements that raised", ("operation",)
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement latency", ("operation",), buckets=DB_BUCKETS
+)
+OUTBOUND_DURATION = Histogram(
+    "outbound_request_duration_seconds", "Calls to external APIs", ("service",)
+)
+OUTBOUND_ERRORS = Counter(
+    "outbound_request_errors_total", "Failed calls to external APIs", ("service",)
+)
+OTP_ISSUED = Counter("otp_issued_total", "OTP codes issued", ("purpose", "channel"))
+OTP_VERIFICATIONS = Counter(
+    "otp_verifications_total", "OTP verification attempts", ("purpose", "result")
+)
+
+
+def otp_channel(identifier: str) -> str:
+    return "email" if "@" in identifier else "sms"
+
+
+class OutboundCall:
+    def __init__(self) -> None:
+        self.failed = False
+
+
+@contextmanager
+def track_outbound(service: str) -> Iterator[OutboundCall]:
+    # Set call.failed for error responses; exceptions count as failures.
+    call = OutboundCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.failed = True
+        raise
+    finally:
+        OUTBOUND_DURATION.labels(service).observe(time.perf_counter() - started)
+        if call.failed:
+            OUTBOUND_ERRORS.labels(service).inc()
+
+
+def instrument_engine(engine) -> None:
+    # engine is a sync Engine (AsyncEngine.sync_engine for the async one).
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info["metrics_started"].pop()
+        operation = _operation(statement)
+        DB_QUERIES.labels(operation).inc()
+        DB_QUERY_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context) -> None:
+        stack = context.connection.info.get("metrics_started") if context.connection else None
+        if stack:
+            stack.pop()
+        DB_QUERY_ERRORS.labels(_operation(context.statement or "")).inc()
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if keyword in {"SELECT", "INSERT", "UPDATE", "DELETE"}:
+        return keyword.lower()
+    if keyword == "WITH":
+        return "cte"
+    return "other"
+
+
+class MetricsMiddleware:
+    # Pure ASGI so streaming responses are timed until their last chunk.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status: Optional[int] = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = status or 500
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The route template, not the raw path, keeps label cardinality
+            # bounded; unmatched paths share one series.
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_DURATION.labels(method, path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, path, status or 500).inc()
@@ -1,5 +1,6 @@
 from app.models.otp import OtpEntry
+from app.models.rate_limit import RateLimitCounter
 from app.models.session import SessionEntry
 from app.models.user import UserEntry
 
-__all__ = ["OtpEntry", "SessionEntry", "UserEntry"]
+__all__ = ["OtpEntry", "RateLimitCounter", "SessionEntry", "UserEntry"]
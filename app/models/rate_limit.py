@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.database import Base
+
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String(255), primary_key=True)
+    window_start = Column(DateTime(timezone=True), nullable=False)
+    count = Column(Integer, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_rate_limit_counters_expires_at", "expires_at"),)
@@ -1,10 +1,58 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, JSON, String
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, JSON, String, text
+from sqlalchemy.orm import deferred
 
 from app.database import Base
 
 
+PERMISSION_FLAGS = (
+    "sales_marketing",
+    "project_management",
+    "access_other_users",
+    "view_admin_panel",
+)
+# Bit i of users.permission_bits is PERMISSION_FLAGS[i]; only ever append
+# flags so stored masks keep their meaning.
+PERMISSION_BITS = {flag: 1 << index for index, flag in enumerate(PERMISSION_FLAGS)}
+
+
+def permission_mask(permissions: Optional[Mapping[str, Any]]) -> int:
+    if not permissions:
+        return 0
+    mask = 0
+    for flag, bit in PERMISSION_BITS.items():
+        if permissions.get(flag):
+            mask |= bit
+    return mask
+
+
+def permission_dict(mask: Optional[int]) -> dict[str, bool]:
+    mask = mask or 0
+    return {flag: bool(mask & bit) for flag, bit in PERMISSION_BITS.items()}
+
+
 class UserEntry(Base):
     __tablename__ = "users"
+    # Keep in sync with migrations/003_users_list_filters.sql and
+    # migrations/005_users_permission_bits.sql.
+    __table_args__ = (
+        Index("ix_users_role_id", "role", "id"),
+        Index("ix_users_phone_verified_id", "phone_verified", "id"),
+        Index(
+            "ix_users_onboarded_id",
+            "id",
+            postgresql_where=text("onboarded_at IS NOT NULL"),
+        ),
+        *(
+            Index(
+                f"ix_users_permbit_{flag}_id",
+                "id",
+                postgresql_where=text(f"(permission_bits & {bit}) <> 0"),
+            )
+            for flag, bit in PERMISSION_BITS.items()
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     email = Column(String(255), nullable=True, unique=True)
@@ -14,7 +62,10 @@ class UserEntry(Base):
     phone_number = Column(String(10), nullable=True, unique=True)
     address = Column(String(255), nullable=True)
     job_title = Column(String(100), nullable=True)
-    permissions = Column(JSON, nullable=True)
+    # Legacy JSON copy, still written for releases that read it but never
+    # loaded; permission_bits is the source of truth.
+    permissions = deferred(Column(JSON, nullable=True))
+    permission_bits = Column(Integer, nullable=False, default=0, server_default=text("0"))
     role = Column(String(50), nullable=True)
     phone_provided = Column(Boolean, nullable=True)
     phone_verified = Column(Boolean, nullable=True)
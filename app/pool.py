@@ -0,0 +1,183 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+# "pre_ping": SELECT 1 on every checkout; "idle": only when the connection sat
+# in the pool longer than the idle threshold; "off": rely on pool_recycle.
+LIVENESS_MODES = {"pre_ping", "idle", "off"}
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    peak_checked_out: int
+    checkouts: int
+    checkout_timeouts: int
+    wait_total_seconds: float
+    wait_max_seconds: float
+    connects: int
+    connect_total_seconds: float
+    connect_max_seconds: float
+    invalidations: int
+    idle_pings: int
+    idle_ping_failures: int
+
+    @property
+    def avg_wait_ms(self) -> float:
+        return self.wait_total_seconds / self.checkouts * 1000 if self.checkouts else 0.0
+
+    @property
+    def avg_connect_ms(self) -> float:
+        return (
+            self.connect_total_seconds / self.connects * 1000 if self.connects else 0.0
+        )
+
+
+class PoolMonitor:
+    def __init__(
+        self, max_overflow: int, liveness: str, idle_ping_seconds: float
+    ) -> None:
+        if liveness not in LIVENESS_MODES:
+            raise RuntimeError(f"Unknown DB_POOL_LIVENESS: {liveness}")
+        self._max_overflow = max_overflow
+        self._liveness = liveness
+        self._idle_ping_seconds = idle_ping_seconds
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+        self._peak_checked_out = 0
+        self._checkouts = 0
+        self._checkout_timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._connects = 0
+        self._connect_total = 0.0
+        self._connect_max = 0.0
+        self._invalidations = 0
+        self._idle_pings = 0
+        self._idle_ping_failures = 0
+
+    @property
+    def pre_ping(self) -> bool:
+        return self._liveness == "pre_ping"
+
+    def pool_class(self, base: type[Pool]) -> type[Pool]:
+        # Pool.recreate() (after dispose or a disconnect) builds a new pool
+        # from self.__class__, so the monitor travels with the class.
+        name = f"Monitored{base.__name__}"
+        return type(name, (_TimedCheckout, base), {"monitor": self})
+
+    def attach(self, engine: Engine) -> None:
+        self._engine = engine
+        event.listen(engine, "do_connect", self._before_connect)
+        event.listen(engine, "connect", self._connected)
+        event.listen(engine, "checkout", self._checked_out)
+        event.listen(engine, "checkin", self._checked_in)
+        event.listen(engine, "invalidate", self._invalidated)
+        event.listen(engine, "soft_invalidate", self._invalidated)
+
+    def record_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self._checkout_timeouts += 1
+                return
+            self._checkouts += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def stats(self) -> PoolStats:
+        pool = self._engine.pool if self._engine is not None else None
+        with self._lock:
+            return PoolStats(
+                size=_call(pool, "size"),
+                max_overflow=self._max_overflow,
+                checked_out=_call(pool, "checkedout"),
+                checked_in=_call(pool, "checkedin"),
+                # QueuePool counts overflow from -pool_size.
+                overflow=max(0, _call(pool, "overflow")),
+                peak_checked_out=self._peak_checked_out,
+                checkouts=self._checkouts,
+                checkout_timeouts=self._checkout_timeouts,
+                wait_total_seconds=self._wait_total,
+                wait_max_seconds=self._wait_max,
+                connects=self._connects,
+                connect_total_seconds=self._connect_total,
+                connect_max_seconds=self._connect_max,
+                invalidations=self._invalidations,
+                idle_pings=self._idle_pings,
+                idle_ping_failures=self._idle_ping_failures,
+            )
+
+    def _before_connect(self, dialect, connection_record, cargs, cparams) -> None:
+        connection_record.info["connect_started"] = time.perf_counter()
+
+    def _connected(self, dbapi_connection, connection_record) -> None:
+        started = connection_record.info.pop("connect_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._connects += 1
+            self._connect_total += elapsed
+            self._connect_max = max(self._connect_max, elapsed)
+
+    def _checked_out(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        checked_in_at = connection_record.info.pop("checked_in_at", None)
+        if (
+            self._liveness == "idle"
+            and checked_in_at is not None
+            and time.monotonic() - checked_in_at >= self._idle_ping_seconds
+        ):
+            self._ping(dbapi_connection)
+        checked_out = _call(self._engine.pool, "checkedout")
+        with self._lock:
+            self._peak_checked_out = max(self._peak_checked_out, checked_out)
+
+    def _checked_in(self, dbapi_connection, connection_record) -> None:
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    def _invalidated(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self._invalidations += 1
+
+    def _ping(self, dbapi_connection) -> None:
+        with self._lock:
+            self._idle_pings += 1
+        try:
+            self._engine.dialect.do_ping(dbapi_connection)
+        except Exception as exc:
+            with self._lock:
+                self._idle_ping_failures += 1
+            # The pool discards this connection and retries with a new one.
+            raise DisconnectionError("Idle connection failed liveness ping") from exc
+
+
+class _TimedCheckout:
+    monitor: PoolMonitor
+
+    def _do_get(self) -> Any:
+        # The time spent here is the wait for a free slot (plus the connect,
+        # when the pool opens a new connection).
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.monitor.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.monitor.record_wait(time.perf_counter() - started, timed_out=False)
+        return connection
+
+
+def _call(pool: Optional[Pool], name: str) -> int:
+    method = getattr(pool, name, None)
+    return method() if method is not None else 0
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used without it
+    orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    # For already JSON-shaped content (dicts, lists, datetimes); skips
+    # jsonable_encoder. UTC datetimes render with "Z" like Pydantic does.
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(
+            content,
+            default=_json_default,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+# Clients may keep a copy but must revalidate it (If-None-Match) before reuse.
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _version_token(value: Optional[datetime]) -> str:
+    return format(int(value.timestamp() * 1_000_000), "x") if value else "0"
+
+
+def strong_etag(resource_id: int, updated_at: Optional[datetime]) -> str:
+    return f'"{resource_id}-{_version_token(updated_at)}"'
+
+
+def weak_etag(*parts: Any) -> str:
+    # Collections: any change to membership or to a member's updated_at
+    # (plus the query that selected them) yields a new tag.
+    key = "|".join(
+        _version_token(part) if isinstance(part, datetime) else repr(part)
+        for part in parts
+    )
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison function (RFC 9110 13.1.2).
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -1,72 +1,120 @@
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Header, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
 
 from app.config import settings
-from app.schemas.otp import OtpRequest, OtpResponse, OtpVerifyRequest, OtpVerifyResponse
+from app.dependencies import DbSession, enforce_otp_rate_limit
+from app.schemas.otp import (
+    OtpDeliveryStatusResponse,
+    OtpRequest,
+    OtpResponse,
+    OtpVerifyRequest,
+    OtpVerifyResponse,
+)
 from app.schemas.tokens import TokenRefreshRequest, TokenRefreshResponse
-from app.services.email import EmailSendError, send_otp_email
-from app.services.otp import otp_store
-from app.services.sms import SmsSendError, send_otp_sms
-from app.services.sessions import session_store
+from app.services.delivery import DeliveryQueueFull, otp_delivery_queue
+from app.services.otp import async_otp_store
+from app.services.sessions import async_session_store
 from app.services.tokens import (
     TokenError,
     create_access_token,
     create_refresh_token,
     decode_refresh_token,
 )
-from app.services.users import user_store
+from app.services.users import async_user_store
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 LOGGER = logging.getLogger(__name__)
 
 
-@router.post("/otp/request", response_model=OtpResponse, response_model_exclude_none=True)
-def request_otp(payload: OtpRequest) -> OtpResponse:
+async def limit_otp_request(request: Request, payload: OtpRequest) -> None:
+    await enforce_otp_rate_limit(request, "request", payload.identifier, payload.purpose)
+
+
+async def limit_otp_verify(request: Request, payload: OtpVerifyRequest) -> None:
+    await enforce_otp_rate_limit(request, "verify", payload.identifier, payload.purpose)
+
+
+@router.post(
+    "/otp/request",
+    response_model=OtpResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(limit_otp_request)],
+)
+async def request_otp(payload: OtpRequest, db: DbSession) -> OtpResponse:
     LOGGER.info(
         "OTP request payload received identifier=%s purpose=%s",
         payload.identifier,
         payload.purpose,
     )
-    record = otp_store.request_otp(payload.identifier, payload.purpose)
+    record = await async_otp_store.request_otp(
+        payload.identifier, payload.purpose, db=db
+    )
+    # Only send a code once it is stored.
+    await db.commit()
     identifier = payload.identifier.strip()
+    delivery_id = None
     if settings.otp_debug:
         LOGGER.warning("OTP debug enabled; skipping send for identifier=%s", identifier)
-    elif "@" in identifier:
-        try:
-            send_otp_email(identifier, record.code, payload.purpose)
-        except EmailSendError as exc:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=str(exc),
-            ) from exc
     else:
         try:
-            send_otp_sms(identifier, record.code, payload.purpose)
-        except SmsSendError as exc:
+            job = otp_delivery_queue.enqueue(identifier, record.code, payload.purpose)
+        except DeliveryQueueFull as exc:
             raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=str(exc),
             ) from exc
+        delivery_id = job.id
     response = OtpResponse(
         message="OTP sent",
         expires_in_seconds=settings.otp_ttl_seconds,
         otp=record.code if settings.otp_debug else None,
+        delivery_id=delivery_id,
     )
     return response
 
 
-@router.post("/otp/verify", response_model=OtpVerifyResponse, response_model_exclude_none=True)
-def verify_otp(payload: OtpVerifyRequest) -> OtpVerifyResponse:
-    verified = otp_store.verify_otp(payload.identifier, payload.purpose, payload.code)
+@router.get("/otp/deliveries/{delivery_id}", response_model=OtpDeliveryStatusResponse)
+async def get_otp_delivery(delivery_id: str) -> OtpDeliveryStatusResponse:
+    job = otp_delivery_queue.get_status(delivery_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Delivery not found",
+        )
+    return OtpDeliveryStatusResponse(
+        delivery_id=job.id,
+        channel=job.channel,
+        status=job.status,
+        attempts=job.attempts,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+@router.post(
+    "/otp/verify",
+    response_model=OtpVerifyResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(limit_otp_verify)],
+)
+async def verify_otp(payload: OtpVerifyRequest, db: DbSession) -> OtpVerifyResponse:
+    # Consuming the code, provisioning the user and opening the session
+    # commit together.
+    verified = await async_otp_store.verify_otp(
+        payload.identifier, payload.purpose, payload.code, db=db
+    )
     if not verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired OTP",
         )
     try:
-        user_entry, existed = user_store.ensure_user_for_identifier(payload.identifier)
+        user_entry, existed = await async_user_store.ensure_user_for_identifier(
+            payload.identifier, db=db
+        )
     except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -74,7 +122,7 @@ def verify_otp(payload: OtpVerifyRequest) -> OtpVerifyResponse:
         ) from exc
     role = user_entry.role or "onboarded_user"
     is_admin = role == "admin"
-    session_id = session_store.create_session(user_entry.id)
+    session_id = await async_session_store.create_session(user_entry.id, db=db)
     try:
         access_token = create_access_token(user_entry.id, session_id)
         refresh_token = create_refresh_token(user_entry.id, session_id)
@@ -100,7 +148,9 @@ def verify_otp(payload: OtpVerifyRequest) -> OtpVerifyResponse:
 
 
 @router.post("/refresh", response_model=TokenRefreshResponse)
-def refresh_tokens(payload: TokenRefreshRequest) -> TokenRefreshResponse:
+async def refresh_tokens(
+    payload: TokenRefreshRequest, db: DbSession
+) -> TokenRefreshResponse:
     try:
         refresh_data = decode_refresh_token(payload.refresh_token)
     except TokenError as exc:
@@ -108,7 +158,7 @@ def refresh_tokens(payload: TokenRefreshRequest) -> TokenRefreshResponse:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(exc),
         ) from exc
-    user_id = session_store.get_user_id(refresh_data.session_id)
+    user_id = await async_session_store.get_user_id(refresh_data.session_id, db=db)
     if user_id is None or user_id != refresh_data.user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -129,7 +179,9 @@ def refresh_tokens(payload: TokenRefreshRequest) -> TokenRefreshResponse:
 
 
 @router.post("/logout")
-def logout(authorization: Optional[str] = Header(default=None)) -> dict:
+async def logout(
+    db: DbSession, authorization: Optional[str] = Header(default=None)
+) -> dict:
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -148,7 +200,7 @@ def logout(authorization: Optional[str] = Header(default=None)) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(exc),
         ) from exc
-    revoked = session_store.revoke_session(refresh_data.session_id)
+    revoked = await async_session_store.revoke_session(refresh_data.session_id, db=db)
     if not revoked:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
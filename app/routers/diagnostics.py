@@ -0,0 +1,58 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends
+
+from app.database import async_pool_monitor, pool_monitor
+from app.routers.users import get_current_user_id
+from app.services.delivery import otp_delivery_queue
+from app.services.http import http_client
+from app.services.sessions import session_store
+from app.services.users import user_store
+
+# Queue, pool and cache internals; never served to anonymous callers.
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+
+@router.get("/otp-delivery")
+def otp_delivery_stats() -> dict:
+    return asdict(otp_delivery_queue.stats())
+
+
+@router.get("/http-clients")
+def http_client_stats() -> dict:
+    return {
+        host: {**asdict(stats), "avg_ms": stats.avg_ms}
+        for host, stats in http_client.stats().items()
+    }
+
+
+@router.get("/caches")
+def cache_stats() -> dict:
+    caches = {"sessions": session_store.cache_stats()}
+    caches.update(
+        (f"user_{name}", stats) for name, stats in user_store.cache_stats().items()
+    )
+    return {
+        name: {**asdict(stats), "hit_ratio": stats.hit_ratio}
+        for name, stats in caches.items()
+    }
+
+
+@router.get("/db-pool")
+def db_pool_stats() -> dict:
+    monitors = {"sync": pool_monitor, "async": async_pool_monitor}
+    pools = {}
+    for name, monitor in monitors.items():
+        if monitor is None:
+            continue
+        stats = monitor.stats()
+        pools[name] = {
+            **asdict(stats),
+            "avg_wait_ms": stats.avg_wait_ms,
+            "avg_connect_ms": stats.avg_connect_ms,
+        }
+    return pools
@@ -1,18 +1,52 @@
 import logging
 import re
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
+from app.dependencies import DbSession, enforce_otp_rate_limit
+from app.responses import (
+    FastJSONResponse,
+    etag_matches,
+    not_modified,
+    set_etag,
+    strong_etag,
+    weak_etag,
+)
 from app.schemas.otp import OTP_LENGTH, OtpResponse
-from app.schemas.users import UserCreate, UserResponse
-from app.services.otp import otp_store
-from app.services.sessions import session_store
-from app.services.sms import SmsSendError, send_otp_sms
+from app.schemas.users import (
+    BulkUserResponse,
+    PermissionName,
+    UserCreate,
+    UserResponse,
+)
+from app.services.delivery import DeliveryQueueFull, otp_delivery_queue
+from app.services.export import EXPORT_MEDIA_TYPES, encode_csv, encode_ndjson
+from app.services.imports import ImportFormatError, parse_user_rows, validate_user_rows
+from app.services.otp import async_otp_store
+from app.services.sessions import async_session_store
 from app.services.tokens import TokenError, decode_access_token
-from app.services.users import user_store
+from app.services.users import (
+    USER_FIELD_COLUMNS,
+    LoadedUser,
+    UserFilters,
+    async_user_store,
+    export_field_names,
+    user_store,
+)
 
 router = APIRouter(prefix="/users", tags=["users"])
 LOGGER = logging.getLogger(__name__)
@@ -70,7 +104,9 @@ class PhoneOtpVerifyResponse(BaseModel):
     phone_verified: bool
 
 
-def get_current_user_id(authorization: Optional[str] = Header(default=None)) -> int:
+async def get_current_user_id(
+    db: DbSession, authorization: Optional[str] = Header(default=None)
+) -> int:
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -89,7 +125,7 @@ def get_current_user_id(authorization: Optional[str] = Header(default=None)) ->
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(exc),
         ) from exc
-    user_id = session_store.get_user_id(access_data.session_id)
+    user_id = await async_session_store.get_user_id(access_data.session_id, db=db)
     if user_id is None or user_id != access_data.user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -98,9 +134,47 @@ def get_current_user_id(authorization: Optional[str] = Header(default=None)) ->
     return access_data.user_id
 
 
-@router.post("/otp/request", response_model=OtpResponse, response_model_exclude_none=True)
-def request_phone_otp(
-    payload: PhoneOtpRequest, user_id: int = Depends(get_current_user_id)
+async def get_current_user(
+    db: DbSession, user_id: int = Depends(get_current_user_id)
+) -> LoadedUser:
+    # The authenticated user with its updated_at, loaded once per request in
+    # the request's session (or served from the user cache).
+    loaded = await async_user_store.load_user(user_id, db=db)
+    if loaded is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return loaded
+
+
+# Both limiters depend on get_current_user_id so unauthenticated calls are
+# rejected before they count against the phone number's bucket.
+async def limit_phone_otp_request(
+    request: Request,
+    payload: PhoneOtpRequest,
+    _: int = Depends(get_current_user_id),
+) -> None:
+    identifier = f"{payload.country_code}{payload.phone_number}"
+    await enforce_otp_rate_limit(request, "request", identifier, "onboarding")
+
+
+async def limit_phone_otp_verify(
+    request: Request,
+    payload: PhoneOtpVerifyRequest,
+    _: int = Depends(get_current_user_id),
+) -> None:
+    identifier = f"{payload.country_code}{payload.phone_number}"
+    await enforce_otp_rate_limit(request, "verify", identifier, "onboarding")
+
+
+@router.post(
+    "/otp/request",
+    response_model=OtpResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(limit_phone_otp_request)],
+)
+async def request_phone_otp(
+    payload: PhoneOtpRequest,
+    db: DbSession,
+    user_id: int = Depends(get_current_user_id),
 ) -> OtpResponse:
     LOGGER.info(
         "Phone OTP request payload received country_code=%s phone_number=%s user_id=%s",
@@ -108,43 +182,54 @@ def request_phone_otp(
         payload.phone_number,
         user_id,
     )
-    if user_store.is_phone_in_use(
-        payload.phone_number, payload.country_code, exclude_user_id=user_id
+    if await async_user_store.is_phone_in_use(
+        payload.phone_number, payload.country_code, exclude_user_id=user_id, db=db
     ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User already exists,use a different phone number",
         )
     identifier = f"{payload.country_code}{payload.phone_number}"
-    record = otp_store.request_otp(identifier, "onboarding")
+    record = await async_otp_store.request_otp(identifier, "onboarding", db=db)
+    # Only send a code once it is stored.
+    await db.commit()
     try:
-        send_otp_sms(identifier, record.code, "onboarding")
-    except SmsSendError as exc:
+        job = otp_delivery_queue.enqueue(identifier, record.code, "onboarding")
+    except DeliveryQueueFull as exc:
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=str(exc),
         ) from exc
     return OtpResponse(
         message="OTP sent",
         expires_in_seconds=settings.otp_ttl_seconds,
         otp=record.code if settings.otp_debug else None,
+        delivery_id=job.id,
     )
 
 
-@router.post("/otp/verify", response_model=PhoneOtpVerifyResponse)
-def verify_phone_otp(
-    payload: PhoneOtpVerifyRequest, user_id: int = Depends(get_current_user_id)
+@router.post(
+    "/otp/verify",
+    response_model=PhoneOtpVerifyResponse,
+    dependencies=[Depends(limit_phone_otp_verify)],
+)
+async def verify_phone_otp(
+    payload: PhoneOtpVerifyRequest,
+    db: DbSession,
+    user_id: int = Depends(get_current_user_id),
 ) -> PhoneOtpVerifyResponse:
     identifier = f"{payload.country_code}{payload.phone_number}"
-    verified = otp_store.verify_otp(identifier, "onboarding", payload.code)
+    verified = await async_otp_store.verify_otp(
+        identifier, "onboarding", payload.code, db=db
+    )
     if not verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired OTP",
         )
     try:
-        user = user_store.verify_phone(
-            user_id, payload.phone_number, payload.country_code
+        user = await async_user_store.verify_phone(
+            user_id, payload.phone_number, payload.country_code, db=db
         )
     except ValueError as exc:
         detail = str(exc)
@@ -160,25 +245,142 @@ def verify_phone_otp(
     )
 
 
+def _parse_fields(raw_fields: Optional[str]) -> Optional[list[str]]:
+    if raw_fields is None:
+        return None
+    fields = [name.strip() for name in raw_fields.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in USER_FIELD_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return fields
+
+
+def _set_next_cursor(
+    response: Response, last_id: Optional[int], count: int, limit: int
+) -> None:
+    # The body stays a plain list; clients pass X-Next-Cursor back as ?after=.
+    if last_id is not None and count == limit:
+        response.headers["X-Next-Cursor"] = str(last_id)
+
+
 @router.get("", response_model=list[UserResponse])
-def list_users(_: int = Depends(get_current_user_id)) -> list[UserResponse]:
-    return user_store.list_users()
+async def list_users(
+    db: DbSession,
+    limit: int = Query(
+        default=settings.users_page_size, ge=1, le=settings.users_page_max
+    ),
+    after: Optional[int] = Query(default=None, ge=0),
+    role: Optional[str] = None,
+    onboarded: Optional[bool] = None,
+    phone_verified: Optional[bool] = None,
+    permission: list[PermissionName] = Query(default=[]),
+    any_permission: list[PermissionName] = Query(default=[]),
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    _: int = Depends(get_current_user_id),
+) -> Response:
+    filters = UserFilters(
+        role=role,
+        onboarded=onboarded,
+        phone_verified=phone_verified,
+        permissions=tuple(permission),
+        any_permissions=tuple(any_permission),
+    )
+    projection = _parse_fields(fields) or list(USER_FIELD_COLUMNS)
+    version = await async_user_store.list_users_version(filters, limit, after, db=db)
+    etag = weak_etag(
+        version.count,
+        version.last_id,
+        version.last_updated_at,
+        filters,
+        projection,
+        limit,
+        after,
+    )
+    if etag_matches(if_none_match, etag):
+        response = not_modified(etag)
+        _set_next_cursor(response, version.last_id, version.count, limit)
+        return response
+    # Rows are already shaped like UserResponse; returning a response directly
+    # skips per-row model validation (response_model only documents it).
+    rows = await async_user_store.list_user_fields(
+        projection, filters, limit, after, db=db
+    )
+    response = FastJSONResponse(rows)
+    set_etag(response, etag)
+    _set_next_cursor(response, rows[-1]["id"] if rows else None, len(rows), limit)
+    return response
+
+
+@router.get("/search", response_model=list[UserResponse])
+async def search_users(
+    db: DbSession,
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=20, ge=1, le=100),
+    _: int = Depends(get_current_user_id),
+) -> list[UserResponse]:
+    return await async_user_store.search_users(q, limit, db=db)
+
+
+@router.get("/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    role: Optional[str] = None,
+    onboarded: Optional[bool] = None,
+    phone_verified: Optional[bool] = None,
+    permission: list[PermissionName] = Query(default=[]),
+    any_permission: list[PermissionName] = Query(default=[]),
+    fields: Optional[str] = None,
+    _: int = Depends(get_current_user_id),
+) -> StreamingResponse:
+    filters = UserFilters(
+        role=role,
+        onboarded=onboarded,
+        phone_verified=phone_verified,
+        permissions=tuple(permission),
+        any_permissions=tuple(any_permission),
+    )
+    projection = _parse_fields(fields) or list(USER_FIELD_COLUMNS)
+    names = export_field_names(projection)
+    # A sync generator: Starlette pulls each chunk on the threadpool, so the
+    # server-side cursor is read as the client consumes the stream.
+    chunks = user_store.iter_user_rows(
+        projection, filters, chunk_size=settings.users_export_chunk_size
+    )
+    encode = encode_csv if format == "csv" else encode_ndjson
+    return StreamingResponse(
+        encode(names, chunks),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(user_id: int = Depends(get_current_user_id)) -> UserResponse:
-    user = user_store.get_user(user_id)
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user
+async def get_me(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    current: LoadedUser = Depends(get_current_user),
+):
+    etag = strong_etag(current.user.id, current.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return current.user
 
 
 @router.put("/me", response_model=UserResponse)
-def update_me(payload: UserCreate, user_id: int = Depends(get_current_user_id)) -> UserResponse:
+async def update_me(
+    payload: UserCreate, db: DbSession, user_id: int = Depends(get_current_user_id)
+) -> UserResponse:
+    # One transaction: a failed update also undoes the OTP use and the phone
+    # verification below.
     if payload.phone_number:
         try:
-            is_verified = user_store.is_phone_verified(
-                user_id, payload.phone_number, payload.country_code
+            is_verified = await async_user_store.is_phone_verified(
+                user_id, payload.phone_number, payload.country_code, db=db
             )
         except ValueError as exc:
             raise HTTPException(
@@ -191,19 +393,23 @@ def update_me(payload: UserCreate, user_id: int = Depends(get_current_user_id))
                     detail="OTP is required when a phone number is provided",
                 )
             identifier = f"{payload.country_code}{payload.phone_number}"
-            if not otp_store.verify_otp(identifier, "onboarding", payload.otp_code):
+            if not await async_otp_store.verify_otp(
+                identifier, "onboarding", payload.otp_code, db=db
+            ):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid or expired OTP",
                 )
-            user_store.verify_phone(user_id, payload.phone_number, payload.country_code)
+            await async_user_store.verify_phone(
+                user_id, payload.phone_number, payload.country_code, db=db
+            )
     elif settings.require_onboarding_otp:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="OTP is required to create a user",
         )
     try:
-        return user_store.update_user(user_id, payload)
+        return await async_user_store.update_user(user_id, payload, db=db)
     except ValueError as exc:
         detail = str(exc)
         status_code = status.HTTP_404_NOT_FOUND if "not found" in detail.lower() else status.HTTP_400_BAD_REQUEST
@@ -211,11 +417,14 @@ def update_me(payload: UserCreate, user_id: int = Depends(get_current_user_id))
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
-    payload: UserCreate, user_id: int, _: int = Depends(get_current_user_id)
+async def update_user(
+    payload: UserCreate,
+    user_id: int,
+    db: DbSession,
+    _: int = Depends(get_current_user_id),
 ) -> UserResponse:
     try:
-        return user_store.update_user(user_id, payload)
+        return await async_user_store.update_user(user_id, payload, db=db)
     except ValueError as exc:
         detail = str(exc)
         status_code = status.HTTP_404_NOT_FOUND if "not found" in detail.lower() else status.HTTP_400_BAD_REQUEST
@@ -223,8 +432,8 @@ def update_user(
 
 
 @router.post("", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
-    payload: UserCreate, user_id: int = Depends(get_current_user_id)
+async def create_user(
+    payload: UserCreate, db: DbSession, user_id: int = Depends(get_current_user_id)
 ) -> UserResponse:
     phone_verified = False
     if payload.phone_number:
@@ -234,7 +443,9 @@ def create_user(
                 detail="OTP is required when a phone number is provided",
             )
         identifier = f"{payload.country_code}{payload.phone_number}"
-        if not otp_store.verify_otp(identifier, "onboarding", payload.otp_code):
+        if not await async_otp_store.verify_otp(
+            identifier, "onboarding", payload.otp_code, db=db
+        ):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid or expired OTP",
@@ -246,9 +457,75 @@ def create_user(
             detail="OTP is required to create a user",
         )
     try:
-        return user_store.create_user(payload, phone_verified=phone_verified)
+        return await async_user_store.create_user(
+            payload, phone_verified=phone_verified, db=db
+        )
     except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(exc),
         ) from exc
+
+
+def _body_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Import bodies are limited to {settings.users_bulk_max_bytes} bytes",
+    )
+
+
+async def _read_bulk_body(request: Request) -> bytes:
+    # Refuse oversized imports before buffering them: up front when the client
+    # declares a Content-Length, otherwise as soon as the stream passes the cap.
+    limit = settings.users_bulk_max_bytes
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        try:
+            too_large = int(declared) > limit
+        except ValueError:
+            too_large = False
+        if too_large:
+            raise _body_too_large()
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise _body_too_large()
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@router.post("/bulk", response_model=BulkUserResponse)
+async def bulk_create_users(
+    request: Request, _: int = Depends(get_current_user_id)
+) -> BulkUserResponse:
+    content_type = request.headers.get("content-type", "").split(";", 1)[0]
+    body = await _read_bulk_body(request)
+    # Parsing and validating thousands of rows is CPU work; keep it off the
+    # event loop.
+    try:
+        raw_rows = await run_in_threadpool(
+            parse_user_rows, body, content_type.strip().lower()
+        )
+    except ImportFormatError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+    if len(raw_rows) > settings.users_bulk_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.users_bulk_max_rows} users per import",
+        )
+    valid, results = await run_in_threadpool(validate_user_rows, raw_rows)
+    if valid:
+        # Not in the request's transaction: each chunk commits on its own so a
+        # large import does not hold one long transaction.
+        results += await async_user_store.bulk_create_users(
+            valid, chunk_size=settings.users_bulk_chunk_size
+        )
+    results.sort(key=lambda result: result.index)
+    created = sum(result.status == "created" for result in results)
+    return BulkUserResponse(
+        created=created, failed=len(results) - created, results=results
+    )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
@@ -16,6 +17,17 @@ class OtpResponse(BaseModel):
     message: str
     expires_in_seconds: int
     otp: Optional[str] = None
+    delivery_id: Optional[str] = None
+
+
+class OtpDeliveryStatusResponse(BaseModel):
+    delivery_id: str
+    channel: Literal["email", "sms"]
+    status: Literal["queued", "sending", "retrying", "sent", "failed", "unknown"]
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 
 class OtpVerifyRequest(BaseModel):
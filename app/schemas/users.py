@@ -1,6 +1,6 @@
 import re
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
@@ -9,6 +9,14 @@ from app.config import settings
 OTP_LENGTH = settings.otp_length
 
 
+PermissionName = Literal[
+    "sales_marketing",
+    "project_management",
+    "access_other_users",
+    "view_admin_panel",
+]
+
+
 class PermissionFlags(BaseModel):
     sales_marketing: bool = False
     project_management: bool = False
@@ -94,3 +102,16 @@ class UserResponse(BaseModel):
     phone_verified: Optional[bool] = None
     created_at: datetime
     onboarded_at: Optional[datetime] = None
+
+
+class BulkUserResult(BaseModel):
+    index: int
+    status: Literal["created", "invalid", "duplicate", "conflict"]
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkUserResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkUserResult]
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import session_scope
+from app.models.otp import OtpEntry
+from app.models.rate_limit import RateLimitCounter
+from app.models.session import SessionEntry
+from app.services.otp import MemoryOtpStore, otp_store
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CleanupRun:
+    started_at: datetime
+    duration_seconds: float
+    otp_deleted: int
+    sessions_deleted: int
+    batches: int
+    rate_limits_deleted: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class CleanupStats:
+    runs: int = 0
+    failures: int = 0
+    otp_deleted: int = 0
+    sessions_deleted: int = 0
+    rate_limits_deleted: int = 0
+    last_run: Optional[CleanupRun] = field(default=None)
+
+
+class ExpiredRowReaper:
+    def __init__(
+        self, interval_seconds: int, batch_size: int, batch_pause_seconds: float
+    ) -> None:
+        self._interval_seconds = interval_seconds
+        self._batch_size = batch_size
+        self._batch_pause_seconds = batch_pause_seconds
+        self._stats = CleanupStats()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> CleanupRun:
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        batches = 0
+        deleted = {OtpEntry: 0, SessionEntry: 0}
+        if settings.rate_limit_backend == "postgres":
+            deleted[RateLimitCounter] = 0
+        error = None
+        try:
+            if isinstance(otp_store, MemoryOtpStore):
+                deleted[OtpEntry] += otp_store.purge_expired()
+            for model in deleted:
+                while True:
+                    count = await run_in_threadpool(
+                        self._delete_batch, model, datetime.now(timezone.utc)
+                    )
+                    batches += 1
+                    deleted[model] += count
+                    if count < self._batch_size:
+                        break
+                    await asyncio.sleep(self._batch_pause_seconds)
+        except Exception as exc:  # keep the loop alive on transient DB errors
+            LOGGER.exception("Expired row cleanup failed")
+            error = str(exc)
+        run = CleanupRun(
+            started_at=started_at,
+            duration_seconds=time.perf_counter() - started,
+            otp_deleted=deleted[OtpEntry],
+            sessions_deleted=deleted[SessionEntry],
+            batches=batches,
+            rate_limits_deleted=deleted.get(RateLimitCounter, 0),
+            error=error,
+        )
+        self._record(run)
+        return run
+
+    def stats(self) -> CleanupStats:
+        return self._stats
+
+    async def _run_forever(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self._interval_seconds)
+
+    def _delete_batch(self, model, now: datetime) -> int:
+        key = model.__mapper__.primary_key[0]
+        expired_ids = (
+            select(key)
+            .where(model.expires_at <= now)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        with session_scope() as session:
+            result = session.execute(
+                delete(model)
+                .where(key.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            )
+            return result.rowcount
+
+    def _record(self, run: CleanupRun) -> None:
+        self._stats.runs += 1
+        if run.error:
+            self._stats.failures += 1
+        self._stats.otp_deleted += run.otp_deleted
+        self._stats.sessions_deleted += run.sessions_deleted
+        self._stats.rate_limits_deleted += run.rate_limits_deleted
+        self._stats.last_run = run
+        LOGGER.info(
+            "Expired row cleanup otp_deleted=%s sessions_deleted=%s "
+            "rate_limits_deleted=%s batches=%s duration=%.3fs",
+            run.otp_deleted,
+            run.sessions_deleted,
+            run.rate_limits_deleted,
+            run.batches,
+            run.duration_seconds,
+        )
+
+
+expired_row_reaper = ExpiredRowReaper(
+    settings.cleanup_interval_seconds,
+    settings.cleanup_batch_size,
+    settings.cleanup_batch_pause_seconds,
+)
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import random
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.email import send_otp_email
+from app.services.http import ResponseLostError
+from app.services.sms import send_otp_sms
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DeliveryQueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class DeliveryJob:
+    id: str
+    channel: str
+    recipient: str
+    code: str
+    purpose: str
+    status: str = "queued"
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass(frozen=True)
+class DeliveryStats:
+    queue_depth: int
+    queue_capacity: int
+    in_flight: int
+    workers: int
+    enqueued: int
+    sent: int
+    failed: int
+    unknown: int
+    retries: int
+    rejected: int
+    send_latency_avg_ms: float
+    send_latency_max_ms: float
+    queue_wait_avg_ms: float
+
+
+class OtpDeliveryQueue:
+    def __init__(
+        self,
+        backends: dict[str, Callable[[str, str, str], None]],
+        worker_count: int,
+        max_queue_size: int,
+        max_attempts: int,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+        status_retention: int,
+    ) -> None:
+        self._backends = backends
+        self._worker_count = max(1, worker_count)
+        self._max_queue_size = max_queue_size
+        self._max_attempts = max(1, max_attempts)
+        self._backoff_seconds = backoff_seconds
+        self._backoff_max_seconds = backoff_max_seconds
+        self._status_retention = status_retention
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._jobs: OrderedDict[str, DeliveryJob] = OrderedDict()
+        self._in_flight = 0
+        self._enqueued = 0
+        self._sent = 0
+        self._failed = 0
+        self._unknown = 0
+        self._retries = 0
+        self._rejected = 0
+        self._sends = 0
+        self._send_seconds = 0.0
+        self._send_max_seconds = 0.0
+        self._dequeued = 0
+        self._wait_seconds = 0.0
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._ensure_queue()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self._worker_count)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, recipient: str, code: str, purpose: str) -> DeliveryJob:
+        channel = "email" if "@" in recipient else "sms"
+        job = DeliveryJob(
+            id=secrets.token_urlsafe(16),
+            channel=channel,
+            recipient=recipient,
+            code=code,
+            purpose=purpose,
+        )
+        try:
+            self._ensure_queue().put_nowait(job)
+        except asyncio.QueueFull as exc:
+            self._rejected += 1
+            raise DeliveryQueueFull("OTP delivery queue is full") from exc
+        self._enqueued += 1
+        self._remember(job)
+        return job
+
+    def get_status(self, job_id: str) -> Optional[DeliveryJob]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> DeliveryStats:
+        queue = self._queue
+        return DeliveryStats(
+            queue_depth=queue.qsize() if queue is not None else 0,
+            queue_capacity=self._max_queue_size,
+            in_flight=self._in_flight,
+            workers=len(self._workers),
+            enqueued=self._enqueued,
+            sent=self._sent,
+            failed=self._failed,
+            unknown=self._unknown,
+            retries=self._retries,
+            rejected=self._rejected,
+            send_latency_avg_ms=(
+                self._send_seconds / self._sends * 1000 if self._sends else 0.0
+            ),
+            send_latency_max_ms=self._send_max_seconds * 1000,
+            queue_wait_avg_ms=(
+                self._wait_seconds / self._dequeued * 1000 if self._dequeued else 0.0
+            ),
+        )
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+        return self._queue
+
+    def _remember(self, job: DeliveryJob) -> None:
+        self._jobs[job.id] = job
+        while len(self._jobs) > self._status_retention:
+            self._jobs.popitem(last=False)
+
+    async def _worker(self) -> None:
+        queue = self._ensure_queue()
+        while True:
+            job = await queue.get()
+            self._dequeued += 1
+            self._wait_seconds += time.perf_counter() - job.enqueued_at
+            self._in_flight += 1
+            try:
+                await self._deliver(job)
+            except Exception:  # a bad job must not kill the worker
+                LOGGER.exception("OTP delivery worker error delivery_id=%s", job.id)
+            finally:
+                self._in_flight -= 1
+                queue.task_done()
+
+    async def _deliver(self, job: DeliveryJob) -> None:
+        job.status = "sending"
+        job.attempts += 1
+        job.updated_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            await run_in_threadpool(
+                self._backends[job.channel], job.recipient, job.code, job.purpose
+            )
+        except Exception as exc:
+            self._record_send(time.perf_counter() - started)
+            job.error = str(exc)
+            job.updated_at = datetime.now(timezone.utc)
+            if _may_have_been_sent(exc):
+                # Twilio/Gmail may already have delivered it; resending would
+                # give the user a second code.
+                job.status = "unknown"
+                job.code = ""
+                self._unknown += 1
+                LOGGER.warning(
+                    "OTP delivery outcome unknown delivery_id=%s channel=%s attempts=%s error=%s",
+                    job.id,
+                    job.channel,
+                    job.attempts,
+                    job.error,
+                )
+                return
+            if job.attempts >= self._max_attempts:
+                job.status = "failed"
+                job.code = ""
+                self._failed += 1
+                LOGGER.error(
+                    "OTP delivery failed delivery_id=%s channel=%s attempts=%s error=%s",
+                    job.id,
+                    job.channel,
+                    job.attempts,
+                    job.error,
+                )
+                return
+            job.status = "retrying"
+            self._retries += 1
+            delay = min(
+                self._backoff_max_seconds,
+                self._backoff_seconds * 2 ** (job.attempts - 1),
+            )
+            delay += random.uniform(0, delay / 2)
+            asyncio.get_running_loop().call_later(delay, self._requeue, job)
+            return
+        self._record_send(time.perf_counter() - started)
+        job.status = "sent"
+        job.error = None
+        job.code = ""
+        job.updated_at = datetime.now(timezone.utc)
+        self._sent += 1
+
+    def _requeue(self, job: DeliveryJob) -> None:
+        job.status = "queued"
+        job.enqueued_at = time.perf_counter()
+        try:
+            self._ensure_queue().put_nowait(job)
+        except asyncio.QueueFull:
+            job.status = "failed"
+            job.error = "OTP delivery queue is full"
+            job.code = ""
+            self._failed += 1
+
+    def _record_send(self, elapsed: float) -> None:
+        self._sends += 1
+        self._send_seconds += elapsed
+        self._send_max_seconds = max(self._send_max_seconds, elapsed)
+
+
+def _may_have_been_sent(exc: BaseException) -> bool:
+    # The SMS/email backends wrap transport errors in their own exceptions.
+    cause: Optional[BaseException] = exc
+    while cause is not None:
+        if isinstance(cause, ResponseLostError):
+            return True
+        cause = cause.__cause__
+    return False
+
+
+otp_delivery_queue = OtpDeliveryQueue(
+    backends={"email": send_otp_email, "sms": send_otp_sms},
+    worker_count=settings.otp_delivery_workers,
+    max_queue_size=settings.otp_delivery_queue_size,
+    max_attempts=settings.otp_delivery_max_attempts,
+    backoff_seconds=settings.otp_delivery_backoff_seconds,
+    backoff_max_seconds=settings.otp_delivery_backoff_max_seconds,
+    status_retention=settings.otp_delivery_status_retention,
+)
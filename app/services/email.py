@@ -3,14 +3,17 @@ from __future__ import annotations
 import base64
 import json
 import logging
+import os
+import tempfile
+import threading
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Optional
-from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
 from app.config import settings
+from app.metrics import track_outbound
+from app.services.http import HttpClientError, http_client
 
 LOGGER = logging.getLogger(__name__)
 
@@ -32,25 +35,23 @@ def send_otp_email(to_email: str, code: str, purpose: str) -> None:
     token = _get_access_token()
 
     payload = json.dumps({"raw": raw_message}).encode("utf-8")
-    request = Request(
-        GMAIL_SEND_ENDPOINT,
-        data=payload,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-        },
-        method="POST",
-    )
-
     try:
-        with urlopen(request, timeout=10) as response:
-            response.read()
-    except HTTPError as exc:
-        error_body = exc.read().decode("utf-8", errors="replace")
-        LOGGER.error("Gmail API error: %s", error_body)
-        raise EmailSendError("Failed to send OTP email") from exc
-    except URLError as exc:
+        with track_outbound("gmail") as call:
+            response = http_client.request(
+                "POST",
+                GMAIL_SEND_ENDPOINT,
+                body=payload,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json",
+                },
+            )
+            call.failed = response.status >= 400
+    except HttpClientError as exc:
         raise EmailSendError("Failed to reach Gmail API") from exc
+    if response.status >= 400:
+        LOGGER.error("Gmail API error: %s", response.text())
+        raise EmailSendError("Failed to send OTP email")
 
 
 def _build_body(code: str, purpose: str, ttl_seconds: int) -> str:
@@ -96,53 +97,116 @@ def _credentials_file_path() -> Path:
     return root / "credentials" / "credentials.json"
 
 
+_TOKEN_EXPIRY_SKEW = timedelta(minutes=1)
+
+
+class _GmailTokenCache:
+    # Holds the access token in memory; refreshes are single-flight so
+    # concurrent sends share one OAuth round trip instead of racing.
+    def __init__(self, refresh_margin_seconds: int) -> None:
+        self._refresh_margin = timedelta(seconds=refresh_margin_seconds)
+        self._lock = threading.Lock()
+        self._token_data: Optional[dict[str, Any]] = None
+        self._token: Optional[str] = None
+        self._expiry: Optional[datetime] = None
+
+    def get(self) -> str:
+        now = datetime.now(timezone.utc)
+        token, expiry = self._token, self._expiry
+        if token and expiry and expiry > now + self._refresh_margin:
+            return token
+        if token and expiry and expiry > now + _TOKEN_EXPIRY_SKEW:
+            # Still usable: refresh proactively if nobody else is, otherwise
+            # keep using the current token instead of waiting.
+            if not self._lock.acquire(blocking=False):
+                return token
+            try:
+                return self._refresh_if_stale()
+            except EmailSendError:
+                LOGGER.warning("Proactive Gmail token refresh failed", exc_info=True)
+                return token
+            finally:
+                self._lock.release()
+        with self._lock:
+            return self._refresh_if_stale()
+
+    def _refresh_if_stale(self) -> str:
+        if self._token_data is None:
+            self._load()
+        now = datetime.now(timezone.utc)
+        if self._token and self._expiry and self._expiry > now + self._refresh_margin:
+            return self._token
+        try:
+            return self._refresh()
+        except EmailSendError:
+            # Re-read token.json next time in case it was fixed on disk.
+            self._token_data = None
+            raise
+
+    def _load(self) -> None:
+        token_data = _load_json(_token_file_path())
+        self._token_data = token_data
+        self._token = token_data.get("token")
+        self._expiry = _parse_expiry(token_data.get("expiry"))
+
+    def _refresh(self) -> str:
+        token_data = dict(self._token_data or {})
+        refresh_token = token_data.get("refresh_token")
+        if not refresh_token:
+            raise EmailSendError("Gmail refresh token is missing")
+
+        client_id, client_secret = _resolve_client_details(token_data)
+        token_uri = token_data.get("token_uri") or "https://oauth2.googleapis.com/token"
+
+        payload = urlencode(
+            {
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token",
+            }
+        ).encode("utf-8")
+
+        try:
+            with track_outbound("gmail_oauth") as call:
+                response = http_client.request(
+                    "POST",
+                    token_uri,
+                    body=payload,
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                    # Refreshing twice only mints another access token.
+                    idempotent=True,
+                )
+                call.failed = response.status >= 400
+        except HttpClientError as exc:
+            raise EmailSendError("Failed to reach Gmail token endpoint") from exc
+        if response.status >= 400:
+            LOGGER.error("Gmail token refresh error: %s", response.text())
+            raise EmailSendError("Failed to refresh Gmail token")
+        data = response.json()
+
+        access_token = data.get("access_token")
+        expires_in = int(data.get("expires_in", 3600))
+        if not access_token:
+            raise EmailSendError("Gmail token refresh did not return an access token")
+
+        expiry = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+        changed = access_token != self._token
+        token_data["token"] = access_token
+        token_data["expiry"] = expiry.isoformat()
+        self._token_data = token_data
+        self._token = access_token
+        self._expiry = expiry
+        if changed:
+            _write_json(_token_file_path(), token_data)
+        return access_token
+
+
+_token_cache = _GmailTokenCache(settings.gmail_token_refresh_margin_seconds)
+
+
 def _get_access_token() -> str:
-    token_path = _token_file_path()
-    token_data = _load_json(token_path)
-
-    token = token_data.get("token")
-    expiry = _parse_expiry(token_data.get("expiry"))
-    if token and expiry and expiry > datetime.now(timezone.utc) + timedelta(minutes=1):
-        return token
-
-    refresh_token = token_data.get("refresh_token")
-    if not refresh_token:
-        raise EmailSendError("Gmail refresh token is missing")
-
-    client_id, client_secret = _resolve_client_details(token_data)
-    token_uri = token_data.get("token_uri") or "https://oauth2.googleapis.com/token"
-
-    payload = urlencode(
-        {
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token",
-        }
-    ).encode("utf-8")
-
-    request = Request(token_uri, data=payload, method="POST")
-    try:
-        with urlopen(request, timeout=10) as response:
-            data = json.loads(response.read().decode("utf-8"))
-    except HTTPError as exc:
-        error_body = exc.read().decode("utf-8", errors="replace")
-        LOGGER.error("Gmail token refresh error: %s", error_body)
-        raise EmailSendError("Failed to refresh Gmail token") from exc
-    except URLError as exc:
-        raise EmailSendError("Failed to reach Gmail token endpoint") from exc
-
-    access_token = data.get("access_token")
-    expires_in = int(data.get("expires_in", 3600))
-    if not access_token:
-        raise EmailSendError("Gmail token refresh did not return an access token")
-
-    token_data["token"] = access_token
-    token_data["expiry"] = (
-        datetime.now(timezone.utc) + timedelta(seconds=expires_in)
-    ).isoformat()
-    _write_json(token_path, token_data)
-    return access_token
+    return _token_cache.get()
 
 
 def _resolve_client_details(token_data: dict[str, Any]) -> tuple[str, str]:
@@ -165,9 +229,12 @@ def _parse_expiry(raw_value: Optional[str]) -> Optional[datetime]:
     if not raw_value:
         return None
     try:
-        return datetime.fromisoformat(raw_value.replace("Z", "+00:00"))
+        expiry = datetime.fromisoformat(raw_value.replace("Z", "+00:00"))
     except ValueError:
         return None
+    if expiry.tzinfo is None:
+        return expiry.replace(tzinfo=timezone.utc)
+    return expiry
 
 
 def _load_json(path: Path) -> dict[str, Any]:
@@ -178,4 +245,12 @@ def _load_json(path: Path) -> dict[str, Any]:
 
 
 def _write_json(path: Path, data: dict[str, Any]) -> None:
-    path.write_text(json.dumps(data), encoding="utf-8")
+    # Write to a sibling temp file and rename so readers never see a partial file.
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
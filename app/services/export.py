@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Sequence
+
+from app.models.user import PERMISSION_FLAGS
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_ndjson(
+    names: Sequence[str], chunks: Iterable[list[tuple]]
+) -> Iterator[bytes]:
+    dumps = json.JSONEncoder(
+        default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode
+    for chunk in chunks:
+        yield "".join(
+            dumps(dict(zip(names, values))) + "\n" for values in chunk
+        ).encode("utf-8")
+
+
+def encode_csv(names: Sequence[str], chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    # permissions is flattened into one boolean column per flag.
+    header = []
+    for name in names:
+        if name == "permissions":
+            header.extend(f"permissions.{flag}" for flag in PERMISSION_FLAGS)
+        else:
+            header.append(name)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield _drain(buffer)
+    permissions_index = names.index("permissions") if "permissions" in names else None
+    for chunk in chunks:
+        for values in chunk:
+            row = [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in values
+            ]
+            if permissions_index is not None:
+                permissions = row[permissions_index]
+                row[permissions_index : permissions_index + 1] = [
+                    permissions[flag] for flag in PERMISSION_FLAGS
+                ]
+            writer.writerow(row)
+        yield _drain(buffer)
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    data = buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    return data
@@ -0,0 +1,239 @@
+import http.client
+import json
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
+
+# Errors a pooled keep-alive connection raises once the server has closed it.
+# Retried on a fresh connection only when the request cannot have been
+# processed: sending it failed, or the request is idempotent. A failure while
+# reading the response to a POST may come after Twilio/Gmail accepted it, so
+# it raises ResponseLostError and callers must not send it again.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class HttpClientError(RuntimeError):
+    pass
+
+
+class ResponseLostError(HttpClientError):
+    # A non-idempotent request went out but its response never arrived; the
+    # server may have acted on it.
+    pass
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    status: int
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode("utf-8"))
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    errors: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+    idle_connections: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_seconds / self.requests * 1000 if self.requests else 0.0
+
+
+class _HostPool:
+    def __init__(
+        self,
+        scheme: str,
+        host: str,
+        port: Optional[int],
+        max_size: int,
+        timeout: float,
+        idle_timeout: float,
+        ssl_context: ssl.SSLContext,
+    ) -> None:
+        self._scheme = scheme
+        self._host = host
+        self._port = port
+        self._max_size = max_size
+        self._timeout = timeout
+        self._idle_timeout = idle_timeout
+        self._ssl_context = ssl_context
+        self._idle: list[tuple[http.client.HTTPConnection, float]] = []
+        self._lock = threading.Lock()
+        self.stats = HostStats()
+
+    def acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used < self._idle_timeout:
+                    self.stats.connections_reused += 1
+                    self.stats.idle_connections = len(self._idle)
+                    return conn, True
+                conn.close()
+            self.stats.connections_opened += 1
+            self.stats.idle_connections = 0
+        return self._connect(), False
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_size:
+                self._idle.append((conn, time.monotonic()))
+                self.stats.idle_connections = len(self._idle)
+                return
+        conn.close()
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.total_seconds += elapsed
+            self.stats.max_seconds = max(self.stats.max_seconds, elapsed)
+            if failed:
+                self.stats.errors += 1
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.stats.idle_connections = 0
+        for conn, _ in idle:
+            conn.close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(
+                self._host, self._port, timeout=self._timeout, context=self._ssl_context
+            )
+        return http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+
+
+class HttpClient:
+    def __init__(
+        self, pool_size: int, timeout_seconds: float, idle_timeout_seconds: float
+    ) -> None:
+        self._pool_size = pool_size
+        self._timeout_seconds = timeout_seconds
+        self._idle_timeout_seconds = idle_timeout_seconds
+        self._ssl_context = ssl.create_default_context()
+        self._pools: dict[tuple[str, str, Optional[int]], _HostPool] = {}
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes] = None,
+        headers: Optional[dict[str, str]] = None,
+        idempotent: Optional[bool] = None,
+    ) -> HttpResponse:
+        if idempotent is None:
+            idempotent = method.upper() in _IDEMPOTENT_METHODS
+        parts = urlsplit(url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise HttpClientError(f"Unsupported URL: {url}")
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        pool = self._pool_for(parts.scheme, parts.hostname, parts.port)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self._send(pool, method, path, body, headers or {}, idempotent)
+            failed = False
+            return response
+        finally:
+            pool.record(time.perf_counter() - started, failed)
+
+    def stats(self) -> dict[str, HostStats]:
+        with self._lock:
+            pools = dict(self._pools)
+        return {
+            f"{scheme}://{host}" + (f":{port}" if port else ""): pool.stats
+            for (scheme, host, port), pool in pools.items()
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    def _pool_for(self, scheme: str, host: str, port: Optional[int]) -> _HostPool:
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(
+                    scheme,
+                    host,
+                    port,
+                    self._pool_size,
+                    self._timeout_seconds,
+                    self._idle_timeout_seconds,
+                    self._ssl_context,
+                )
+                self._pools[key] = pool
+            return pool
+
+    def _send(
+        self,
+        pool: _HostPool,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: dict[str, str],
+        idempotent: bool,
+    ) -> HttpResponse:
+        while True:
+            conn, reused = pool.acquire()
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except _STALE_CONNECTION_ERRORS as exc:
+                conn.close()
+                if reused and (not sent or idempotent):
+                    continue
+                raise _client_error(exc, sent, idempotent) from exc
+            except (http.client.HTTPException, OSError) as exc:
+                conn.close()
+                raise _client_error(exc, sent, idempotent) from exc
+            if response.will_close:
+                conn.close()
+            else:
+                pool.release(conn)
+            return HttpResponse(status=response.status, body=data)
+
+
+def _client_error(exc: Exception, sent: bool, idempotent: bool) -> HttpClientError:
+    if sent and not idempotent:
+        return ResponseLostError(str(exc))
+    return HttpClientError(str(exc))
+
+
+http_client = HttpClient(
+    settings.http_pool_size,
+    settings.http_timeout_seconds,
+    settings.http_idle_timeout_seconds,
+)
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from typing import Any
+
+from pydantic import ValidationError
+
+from app.models.user import PERMISSION_FLAGS
+from app.schemas.users import BulkUserResult, UserCreate
+
+_TRUE_VALUES = {"1", "true", "t", "yes", "y", "x"}
+_TEXT_COLUMNS = (
+    "first_name",
+    "last_name",
+    "country_code",
+    "phone_number",
+    "address",
+    "job_title",
+    "email",
+)
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def parse_user_rows(body: bytes, content_type: str) -> list[dict[str, Any]]:
+    if content_type in {"text/csv", "application/csv"}:
+        return _parse_csv(body)
+    if content_type in {"application/json", ""}:
+        return _parse_json(body)
+    raise ImportFormatError(f"Unsupported content type: {content_type}")
+
+
+def validate_user_rows(
+    raw_rows: list[dict[str, Any]],
+) -> tuple[list[tuple[int, UserCreate]], list[BulkUserResult]]:
+    valid: list[tuple[int, UserCreate]] = []
+    invalid: list[BulkUserResult] = []
+    for index, raw_row in enumerate(raw_rows):
+        try:
+            valid.append((index, UserCreate.model_validate(raw_row)))
+        except ValidationError as exc:
+            invalid.append(
+                BulkUserResult(index=index, status="invalid", error=_describe(exc))
+            )
+    return valid, invalid
+
+
+def _parse_json(body: bytes) -> list[dict[str, Any]]:
+    try:
+        payload = json.loads(body or b"[]")
+    except ValueError as exc:
+        raise ImportFormatError("Body is not valid JSON") from exc
+    if isinstance(payload, dict):
+        payload = payload.get("users")
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+        raise ImportFormatError('Expected a JSON array of users or {"users": [...]}')
+    return payload
+
+
+def _parse_csv(body: bytes) -> list[dict[str, Any]]:
+    # Columns match GET /api/users/export?format=csv: one column per permission
+    # flag, named either "<flag>" or "permissions.<flag>".
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError("CSV must be UTF-8 encoded") from exc
+    rows = []
+    for record in csv.DictReader(io.StringIO(text)):
+        row: dict[str, Any] = {
+            column: (record.get(column) or "").strip() or None
+            for column in _TEXT_COLUMNS
+        }
+        row["permissions"] = {
+            flag: _is_true(record.get(f"permissions.{flag}", record.get(flag)))
+            for flag in PERMISSION_FLAGS
+        }
+        rows.append(row)
+    return rows
+
+
+def _is_true(value: Any) -> bool:
+    return str(value or "").strip().lower() in _TRUE_VALUES
+
+
+def _describe(exc: ValidationError) -> str:
+    messages = []
+    for error in exc.errors():
+        location = ".".join(str(part) for part in error["loc"])
+        messages.append(f"{location}: {error['msg']}" if location else error["msg"])
+    return "; ".join(messages)
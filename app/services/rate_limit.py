@@ -0,0 +1,174 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+
+from sqlalchemy import case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.config import settings
+from app.database import run_db, session_scope
+from app.models.rate_limit import RateLimitCounter
+from app.services.otp import normalize_identifier
+
+
+class RateLimitExceeded(RuntimeError):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Too many requests, try again later")
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    period_seconds: float
+
+    @classmethod
+    def parse(cls, raw_value: str) -> "Rate":
+        limit, _, period = raw_value.partition("/")
+        try:
+            rate = cls(limit=int(limit), period_seconds=float(period))
+        except ValueError as exc:
+            raise RuntimeError(f"Invalid rate limit: {raw_value!r}") from exc
+        if rate.limit < 1 or rate.period_seconds <= 0:
+            raise RuntimeError(f"Invalid rate limit: {raw_value!r}")
+        return rate
+
+
+class MemoryRateLimiter:
+    # Token buckets in lock-striped LRU maps; a bucket evicted under memory
+    # pressure simply starts full again.
+    def __init__(self, max_keys: int, stripes: int = 16) -> None:
+        self._stripes = [
+            (threading.Lock(), OrderedDict()) for _ in range(max(1, stripes))
+        ]
+        self._max_keys_per_stripe = max(1, max_keys // len(self._stripes))
+
+    def hit(self, key: str, rate: Rate, session: Optional[Session] = None) -> float:
+        now = time.monotonic()
+        refill_per_second = rate.limit / rate.period_seconds
+        lock, buckets = self._stripes[hash(key) % len(self._stripes)]
+        with lock:
+            tokens, updated = buckets.pop(key, (float(rate.limit), now))
+            tokens = min(float(rate.limit), tokens + (now - updated) * refill_per_second)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / refill_per_second
+            buckets[key] = (tokens, now)
+            while len(buckets) > self._max_keys_per_stripe:
+                buckets.popitem(last=False)
+        return retry_after
+
+
+class PostgresRateLimiter:
+    # Fixed-window counters shared by every worker through rate_limit_counters.
+    def hit(self, key: str, rate: Rate, session: Optional[Session] = None) -> float:
+        now = datetime.now(timezone.utc)
+        window = math.floor(now.timestamp() / rate.period_seconds) * rate.period_seconds
+        window_start = datetime.fromtimestamp(window, tz=timezone.utc)
+        window_end = window_start + timedelta(seconds=rate.period_seconds)
+        statement = insert(RateLimitCounter).values(
+            key=key, window_start=window_start, count=1, expires_at=window_end
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[RateLimitCounter.key],
+            set_={
+                "count": case(
+                    (
+                        RateLimitCounter.window_start == statement.excluded.window_start,
+                        RateLimitCounter.count + 1,
+                    ),
+                    else_=1,
+                ),
+                "window_start": statement.excluded.window_start,
+                "expires_at": statement.excluded.expires_at,
+            },
+        ).returning(RateLimitCounter.count)
+        with session_scope(session) as session:
+            count = session.execute(statement).scalar_one()
+        if count <= rate.limit:
+            return 0.0
+        return (window_end - now).total_seconds()
+
+
+class OtpRateLimiter:
+    def __init__(
+        self,
+        backend: Union[MemoryRateLimiter, PostgresRateLimiter],
+        request_identifier: Rate,
+        request_ip: Rate,
+        verify_identifier: Rate,
+        verify_ip: Rate,
+        enabled: bool = True,
+    ) -> None:
+        self._backend = backend
+        self._enabled = enabled
+        self._rates = {
+            "request": (request_identifier, request_ip),
+            "verify": (verify_identifier, verify_ip),
+        }
+
+    async def enforce(
+        self, client_ip: str, action: str, identifier: str, purpose: str
+    ) -> None:
+        if not self._enabled:
+            return
+        identifier_rate, ip_rate = self._rates[action]
+        # Identifiers can be 255 characters; a digest keeps every key within
+        # rate_limit_counters.key (VARCHAR(255)).
+        digest = hashlib.sha256(
+            normalize_identifier(identifier).encode("utf-8")
+        ).hexdigest()
+        checks = [
+            (f"otp:{action}:ip:{client_ip}", ip_rate),
+            (f"otp:{action}:id:{purpose}:{digest}", identifier_rate),
+        ]
+        for key, rate in checks:
+            if isinstance(self._backend, MemoryRateLimiter):
+                retry_after = self._backend.hit(key, rate)
+            else:
+                retry_after = await run_db(self._backend.hit, key, rate)
+            if retry_after > 0:
+                raise RateLimitExceeded(retry_after)
+
+
+def client_ip(request: Request) -> str:
+    if settings.rate_limit_trust_forwarded:
+        # Each proxy appends the address it saw, so only the rightmost
+        # RATE_LIMIT_FORWARDED_HOPS entries come from our proxies; anything
+        # further left is whatever the client sent.
+        hops = settings.rate_limit_forwarded_hops
+        entries = [
+            entry.strip()
+            for entry in request.headers.get("x-forwarded-for", "").split(",")
+            if entry.strip()
+        ]
+        if hops > 0 and len(entries) >= hops:
+            return entries[-hops]
+    return request.client.host if request.client else "unknown"
+
+
+def _build_backend() -> Union[MemoryRateLimiter, PostgresRateLimiter]:
+    if settings.rate_limit_backend == "memory":
+        return MemoryRateLimiter(settings.rate_limit_max_keys)
+    if settings.rate_limit_backend == "postgres":
+        return PostgresRateLimiter()
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {settings.rate_limit_backend}")
+
+
+otp_rate_limiter = OtpRateLimiter(
+    _build_backend(),
+    request_identifier=Rate.parse(settings.rate_limit_otp_request_identifier),
+    request_ip=Rate.parse(settings.rate_limit_otp_request_ip),
+    verify_identifier=Rate.parse(settings.rate_limit_otp_verify_identifier),
+    verify_ip=Rate.parse(settings.rate_limit_otp_verify_ip),
+    enabled=settings.rate_limit_enabled,
+)
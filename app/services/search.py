@@ -0,0 +1,285 @@
+import heapq
+import re
+import threading
+import time
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from sqlalchemy import String, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from app.database import session_scope
+from app.models.user import UserEntry
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+_PHONE_PUNCTUATION = re.compile(r"[\s()+.-]")
+# Posting-list keys for 1-2 character queries: "\0" + token prefix.
+_PREFIX_MARK = "\0"
+
+# Ranking, best first: whole field equals the query, field starts with it,
+# a word in the field starts with it, or it appears anywhere in the field.
+_SCORE_EXACT = 3
+_SCORE_PREFIX = 2
+_SCORE_WORD_PREFIX = 1
+_SCORE_SUBSTRING = 0
+
+
+class UserDocument(NamedTuple):
+    id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: Optional[str]
+    phone_number: Optional[str]
+
+
+def normalize_query(query: str) -> str:
+    normalized = query.strip().lower()
+    digits = _PHONE_PUNCTUATION.sub("", normalized)
+    # "(555) 123-45" should find the stored digits "55512345...".
+    return digits if digits.isdigit() else normalized
+
+
+def _fields(document: UserDocument) -> tuple[str, ...]:
+    # "first last" is its own field so full-name queries ("john smith",
+    # "john s") match, as they do against the postgres backend's document.
+    full_name = (
+        f"{document.first_name} {document.last_name}"
+        if document.first_name and document.last_name
+        else None
+    )
+    return tuple(
+        value.lower()
+        for value in (
+            document.first_name,
+            document.last_name,
+            full_name,
+            document.email,
+            document.phone_number,
+        )
+        if value
+    )
+
+
+def _keys(fields: tuple[str, ...]) -> set[str]:
+    keys = set()
+    for value in fields:
+        for index in range(len(value) - 2):
+            keys.add(value[index : index + 3])
+        for token in _TOKEN_SPLIT.split(value):
+            if token:
+                keys.add(_PREFIX_MARK + token[:1])
+                keys.add(_PREFIX_MARK + token[:2])
+    return keys
+
+
+def _score(fields: tuple[str, ...], query: str) -> Optional[tuple[int, int]]:
+    best: Optional[tuple[int, int]] = None
+    for value in fields:
+        if query not in value:
+            continue
+        if value == query:
+            score = _SCORE_EXACT
+        elif value.startswith(query):
+            score = _SCORE_PREFIX
+        elif any(token.startswith(query) for token in _TOKEN_SPLIT.split(value)):
+            score = _SCORE_WORD_PREFIX
+        else:
+            score = _SCORE_SUBSTRING
+        # Higher score first, then the shorter (closer) field.
+        candidate = (-score, len(value))
+        if best is None or candidate < best:
+            best = candidate
+    return best
+
+
+class MemoryUserSearchIndex:
+    # Inverted index from trigrams (and 1-2 character word prefixes) to user
+    # ids, kept current by UserStore writes. Candidates from the posting
+    # lists are confirmed with a substring check, so results are exact.
+    # Requests never build it: a background task (app.main) rebuilds it from
+    # the database every rebuild_seconds or after mark_stale and swaps the new
+    # index in, so searches keep using the old one meanwhile. Until the first
+    # build finishes, searches go to the database.
+    def __init__(
+        self,
+        rebuild_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._rebuild_seconds = rebuild_seconds
+        self._clock = clock
+        self._documents: dict[int, tuple[str, ...]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._built_at: Optional[float] = None
+        self._stale = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._pending: Optional[list[UserDocument]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._built_at is not None
+
+    @property
+    def needs_rebuild(self) -> bool:
+        built_at = self._built_at
+        if built_at is None or self._stale:
+            return True
+        return self._rebuild_seconds > 0 and self._clock() - built_at >= self._rebuild_seconds
+
+    def rebuild(self, load: Callable[[], Iterable[UserDocument]]) -> bool:
+        # -> False when another rebuild is already running.
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                self._pending = []
+                self._stale = False
+            documents: dict[int, tuple[str, ...]] = {}
+            postings: dict[str, set[int]] = {}
+            try:
+                for document in load():
+                    fields = _fields(document)
+                    documents[document.id] = fields
+                    for key in _keys(fields):
+                        postings.setdefault(key, set()).add(document.id)
+            except BaseException:
+                with self._lock:
+                    self._pending = None
+                    self._stale = True
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._documents, self._postings = documents, postings
+                # Writes that landed while the snapshot was being read.
+                for document in pending:
+                    self._index_locked(document)
+                self._built_at = self._clock()
+            return True
+        finally:
+            self._build_lock.release()
+
+    def index(self, documents: Iterable[UserDocument]) -> None:
+        with self._lock:
+            for document in documents:
+                if self._pending is not None:
+                    self._pending.append(document)
+                if self._built_at is not None:
+                    self._index_locked(document)
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def search(
+        self, query: str, limit: int, session: Optional[Session] = None
+    ) -> list[int]:
+        query = normalize_query(query)
+        if not query:
+            return []
+        if not self.ready:
+            return _search_database(query, limit, session)
+        if len(query) < 3:
+            keys = [_PREFIX_MARK + query]
+        else:
+            keys = {query[index : index + 3] for index in range(len(query) - 2)}
+        with self._lock:
+            postings = [self._postings.get(key) for key in keys]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            ranked = []
+            for user_id in candidates:
+                score = _score(self._documents[user_id], query)
+                if score is not None:
+                    ranked.append((score, user_id))
+        return [user_id for _, user_id in heapq.nsmallest(limit, ranked)]
+
+    def _index_locked(self, document: UserDocument) -> None:
+        previous = self._documents.pop(document.id, None)
+        if previous is not None:
+            for key in _keys(previous):
+                posting = self._postings.get(key)
+                if posting is not None:
+                    posting.discard(document.id)
+                    if not posting:
+                        del self._postings[key]
+        fields = _fields(document)
+        self._documents[document.id] = fields
+        for key in _keys(fields):
+            self._postings.setdefault(key, set()).add(document.id)
+
+
+class PostgresUserSearch:
+    # Shared across workers; requires migrations/004_users_search_trgm.sql.
+    # The expression must match the index definition there exactly.
+    _document = func.lower(
+        func.coalesce(UserEntry.first_name, literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(UserEntry.last_name, literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(UserEntry.email, literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(UserEntry.phone_number, literal_column("''")),
+        type_=String,
+    )
+
+    ready = True
+    needs_rebuild = False
+
+    def rebuild(self, load: Callable[[], Iterable[UserDocument]]) -> bool:
+        return False
+
+    def index(self, documents: Iterable[UserDocument]) -> None:
+        return
+
+    def mark_stale(self) -> None:
+        return
+
+    def search(
+        self, query: str, limit: int, session: Optional[Session] = None
+    ) -> list[int]:
+        query = normalize_query(query)
+        if not query:
+            return []
+        statement = (
+            select(UserEntry.id)
+            .where(self._document.contains(query, autoescape=True))
+            .order_by(func.word_similarity(query, self._document).desc(), UserEntry.id)
+            .limit(limit)
+        )
+        with session_scope(session) as session:
+            return list(session.scalars(statement))
+
+
+# Candidates read per requested result when the memory index is not built yet.
+_FALLBACK_CANDIDATES = 50
+
+
+def _search_database(
+    query: str, limit: int, session: Optional[Session] = None
+) -> list[int]:
+    # Until the memory index is built: a LIKE scan over the same document
+    # expression (no pg_trgm needed), ranked the way the index ranks.
+    statement = (
+        select(
+            UserEntry.id,
+            UserEntry.first_name,
+            UserEntry.last_name,
+            UserEntry.email,
+            UserEntry.phone_number,
+        )
+        .where(PostgresUserSearch._document.contains(query, autoescape=True))
+        .order_by(UserEntry.id)
+        .limit(limit * _FALLBACK_CANDIDATES)
+    )
+    with session_scope(session) as session:
+        documents = [UserDocument(*row) for row in session.execute(statement)]
+    ranked = []
+    for document in documents:
+        fields = _fields(document)
+        # Like the index, 1-2 character queries only match word prefixes.
+        if len(query) < 3 and _PREFIX_MARK + query not in _keys(fields):
+            continue
+        score = _score(fields, query)
+        if score is not None:
+            ranked.append((score, document.id))
+    return [user_id for _, user_id in heapq.nsmallest(limit, ranked)]
@@ -2,20 +2,25 @@ import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import session_scope
+from app.database import UnitOfWork, after_commit, run_db, session_scope
 from app.models.session import SessionEntry
+from app.services.cache import CacheStats, TTLCache
 
 
 class SessionStore:
-    def create_session(self, user_id: int) -> str:
+    def __init__(self, cache: TTLCache) -> None:
+        # session token -> (user_id, expires_at); entries never outlive expires_at.
+        self._cache = cache
+
+    def create_session(self, user_id: int, session: Optional[Session] = None) -> str:
         now = datetime.now(timezone.utc)
         token = secrets.token_urlsafe(32)
         expires_at = now + timedelta(days=settings.refresh_token_expire_days)
-        with session_scope() as session:
-            session.execute(delete(SessionEntry).where(SessionEntry.expires_at <= now))
+        with session_scope(session) as session:
             session.add(
                 SessionEntry(
                     token=token,
@@ -27,20 +32,41 @@ class SessionStore:
             )
         return token
 
-    def revoke_session(self, token: str) -> bool:
+    def revoke_session(self, token: str, session: Optional[Session] = None) -> bool:
         now = datetime.now(timezone.utc)
-        with session_scope() as session:
+        with session_scope(session) as session:
             result = session.execute(
                 update(SessionEntry)
                 .where(SessionEntry.token == token, SessionEntry.revoked_at.is_(None))
                 .values(revoked_at=now)
             )
-            return result.rowcount > 0
+            revoked = result.rowcount > 0
+        after_commit(session, lambda: self._cache.pop(token))
+        return revoked
+
+    def get_user_id(
+        self, token: str, session: Optional[Session] = None
+    ) -> Optional[int]:
+        user_id = self.cached_user_id(token)
+        if user_id is not None:
+            return user_id
+        return self._load_user_id(token, session=session)
+
+    def cached_user_id(self, token: str) -> Optional[int]:
+        cached = self._cache.get(token)
+        if cached is None:
+            return None
+        user_id, expires_at = cached
+        if expires_at > datetime.now(timezone.utc):
+            return user_id
+        self._cache.pop(token)
+        return None
 
-    def get_user_id(self, token: str) -> Optional[int]:
+    def _load_user_id(
+        self, token: str, session: Optional[Session] = None
+    ) -> Optional[int]:
         now = datetime.now(timezone.utc)
-        with session_scope() as session:
-            session.execute(delete(SessionEntry).where(SessionEntry.expires_at <= now))
+        with session_scope(session) as session:
             result = session.execute(
                 select(SessionEntry).where(
                     SessionEntry.token == token,
@@ -51,7 +77,40 @@ class SessionStore:
             entry = result.scalar_one_or_none()
             if entry is None:
                 return None
-            return entry.user_id
+            user_id, expires_at = entry.user_id, entry.expires_at
+        self._cache.set(
+            token,
+            (user_id, expires_at),
+            ttl_seconds=(expires_at - now).total_seconds(),
+        )
+        return user_id
+
+    def cache_stats(self) -> CacheStats:
+        return self._cache.stats()
+
+
+class AsyncSessionStore:
+    def __init__(self, store: SessionStore) -> None:
+        self._store = store
+
+    async def create_session(
+        self, user_id: int, db: Optional[UnitOfWork] = None
+    ) -> str:
+        return await run_db(self._store.create_session, user_id, db=db)
+
+    async def revoke_session(self, token: str, db: Optional[UnitOfWork] = None) -> bool:
+        return await run_db(self._store.revoke_session, token, db=db)
+
+    async def get_user_id(
+        self, token: str, db: Optional[UnitOfWork] = None
+    ) -> Optional[int]:
+        user_id = self._store.cached_user_id(token)
+        if user_id is not None:
+            return user_id
+        return await run_db(self._store._load_user_id, token, db=db)
 
 
-session_store = SessionStore()
+session_store = SessionStore(
+    TTLCache(settings.session_cache_size, settings.session_cache_ttl_seconds)
+)
+async_session_store = AsyncSessionStore(session_store)
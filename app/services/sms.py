@@ -3,11 +3,11 @@ from __future__ import annotations
 import base64
 import logging
 import re
-from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
 from app.config import settings
+from app.metrics import track_outbound
+from app.services.http import HttpClientError, http_client
 
 LOGGER = logging.getLogger(__name__)
 
@@ -40,32 +40,31 @@ def send_otp_sms(to_phone: str, code: str, purpose: str) -> None:
     token = base64.b64encode(f"{account_sid}:{auth_token}".encode("utf-8")).decode(
         "ascii"
     )
-    request = Request(
-        endpoint,
-        data=payload,
-        headers={
-            "Authorization": f"Basic {token}",
-            "Content-Type": "application/x-www-form-urlencoded",
-        },
-        method="POST",
-    )
     try:
-        with urlopen(request, timeout=10) as response:
-            response.read()
-    except HTTPError as exc:
-        error_body = exc.read().decode("utf-8", errors="replace")
+        with track_outbound("twilio") as call:
+            response = http_client.request(
+                "POST",
+                endpoint,
+                body=payload,
+                headers={
+                    "Authorization": f"Basic {token}",
+                    "Content-Type": "application/x-www-form-urlencoded",
+                },
+            )
+            call.failed = response.status >= 400
+    except HttpClientError as exc:
+        raise SmsSendError("Failed to reach Twilio API") from exc
+    if response.status >= 400:
         LOGGER.error(
             "Twilio API error to=%s from=%s account_sid=%s auth_token_len=%s status=%s response=%s",
             to_number,
             from_number,
             masked_sid,
             token_length,
-            exc.code,
-            error_body,
+            response.status,
+            response.text(),
         )
-        raise SmsSendError("Failed to send OTP SMS") from exc
-    except URLError as exc:
-        raise SmsSendError("Failed to reach Twilio API") from exc
+        raise SmsSendError("Failed to send OTP SMS")
 
 
 def _normalize_e164(phone_number: str) -> str:
@@ -1,13 +1,39 @@
 import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Optional, Tuple
+from typing import Any, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
 
-from sqlalchemy import select
+from sqlalchemy import Select, func, literal_column, or_, select, true, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.config import settings
-from app.database import session_scope
-from app.models.user import UserEntry
-from app.schemas.users import PermissionFlags, UserCreate, UserResponse
+from app.database import (
+    UnitOfWork,
+    after_commit,
+    after_rollback,
+    run_db,
+    session_scope,
+)
+from app.models.user import (
+    PERMISSION_BITS,
+    UserEntry,
+    permission_dict,
+    permission_mask,
+)
+from app.schemas.users import (
+    BulkUserResult,
+    PermissionFlags,
+    UserCreate,
+    UserResponse,
+)
+from app.services.cache import CacheStats, TTLCache
+from app.services.search import MemoryUserSearchIndex, PostgresUserSearch, UserDocument
 
 
 def _normalize_phone(phone_number: str) -> str:
@@ -27,18 +53,8 @@ def _normalize_email(email: str) -> str:
     return email.strip().lower()
 
 
-def _has_permission_flags(permissions: Optional[dict]) -> bool:
-    if not permissions:
-        return False
-    return any(permissions.values())
-
-
 def _is_onboarded(entry: UserEntry) -> bool:
-    return bool(
-        entry.first_name
-        and entry.address
-        and _has_permission_flags(entry.permissions)
-    )
+    return bool(entry.first_name and entry.address and entry.permission_bits)
 
 
 def _role_for_email(email: Optional[str]) -> str:
@@ -86,12 +102,364 @@ def _ensure_phone_verified(entry: UserEntry) -> bool:
     return False
 
 
+# Unique constraints on users -> the error the routers turn into a 400.
+_UNIQUE_VIOLATIONS = {
+    "email": "Email already in use",
+    "phone_number": "Phone number already in use",
+}
+
+
+@contextmanager
+def _unique_violations(session: Session) -> Iterator[None]:
+    # The unique constraints are the uniqueness check; the savepoint keeps a
+    # caller-owned transaction usable after a violation.
+    try:
+        with session.begin_nested():
+            yield
+    except IntegrityError as exc:
+        diag = getattr(exc.orig, "diag", None)
+        constraint = getattr(diag, "constraint_name", None) or str(exc.orig)
+        for column, message in _UNIQUE_VIOLATIONS.items():
+            if column in constraint:
+                raise ValueError(message) from exc
+        raise
+
+
+def _new_user_values(
+    payload: UserCreate, phone_verified: bool, now: datetime
+) -> dict[str, Any]:
+    email = _normalize_email(payload.email) if payload.email else None
+    phone_number = payload.phone_number
+    permissions = payload.permissions.model_dump()
+    permission_bits = permission_mask(permissions)
+    values = dict(
+        email=email,
+        first_name=payload.first_name,
+        last_name=payload.last_name,
+        country_code=_normalize_country_code(payload.country_code),
+        phone_number=phone_number,
+        address=payload.address,
+        job_title=payload.job_title,
+        permissions=permissions,
+        permission_bits=permission_bits,
+        role=_role_for_email(email),
+        phone_provided=bool(phone_number),
+        phone_verified=bool(phone_number) and phone_verified,
+        created_at=now,
+        updated_at=now,
+        onboarded_at=now if permissions else None,
+    )
+    if payload.first_name and payload.address and permission_bits:
+        values["onboarded_at"] = now
+    return values
+
+
+def _login_changes(entry: UserEntry, field: str) -> dict[str, Any]:
+    # Dirty check mirroring _role_for_email, _apply_seed_profile,
+    # _apply_phone_provided and _ensure_phone_verified without touching entry.
+    changes: dict[str, Any] = {}
+    role = _role_for_email(entry.email)
+    if entry.role != role:
+        changes["role"] = role
+    first_name, last_name = _seed_profile_for_email(entry.email)
+    if first_name and not entry.first_name:
+        changes["first_name"] = first_name
+    if last_name and not entry.last_name:
+        changes["last_name"] = last_name
+    provided = bool(entry.phone_number)
+    if entry.phone_provided != provided:
+        changes["phone_provided"] = provided
+    if field == "phone_number" and entry.phone_number:
+        # Logging in with the phone OTP proves ownership of the number.
+        if entry.phone_verified is not True:
+            changes["phone_verified"] = True
+    elif entry.phone_verified is None:
+        changes["phone_verified"] = False
+    return changes
+
+
+def _normalize_login_entry(session: Session, entry: UserEntry, field: str) -> bool:
+    # Returning users are already normalized, so login stays a single SELECT;
+    # otherwise one UPDATE writes only the differing columns.
+    changes = _login_changes(entry, field)
+    if not changes:
+        return False
+    changes["updated_at"] = datetime.now(timezone.utc)
+    session.execute(
+        update(UserEntry)
+        .where(UserEntry.id == entry.id)
+        .values(**changes)
+        .execution_options(synchronize_session=False)
+    )
+    for key, value in changes.items():
+        set_committed_value(entry, key, value)
+    return True
+
+
+def _reconcile_rules() -> list[tuple[str, dict[str, Any], list]]:
+    # (rule name, SET values, WHERE conditions); set-based equivalents of
+    # _role_for_email, _apply_seed_profile, _apply_phone_provided and
+    # _ensure_phone_verified.
+    rules = []
+    seed_email = settings.seed_email
+    not_seed = true()
+    if seed_email:
+        email = func.lower(func.trim(UserEntry.email))
+        is_seed = email == seed_email
+        not_seed = or_(UserEntry.email.is_(None), email != seed_email)
+        rules.append(
+            ("role_admin", {"role": "admin"}, [is_seed, UserEntry.role.is_distinct_from("admin")])
+        )
+        first_name, last_name = _seed_profile_for_email(seed_email)
+        if first_name:
+            rules.append(
+                (
+                    "seed_first_name",
+                    {"first_name": first_name},
+                    [is_seed, func.coalesce(UserEntry.first_name, "") == ""],
+                )
+            )
+        if last_name:
+            rules.append(
+                (
+                    "seed_last_name",
+                    {"last_name": last_name},
+                    [is_seed, func.coalesce(UserEntry.last_name, "") == ""],
+                )
+            )
+    rules.append(
+        (
+            "role_onboarded_user",
+            {"role": "onboarded_user"},
+            [not_seed, UserEntry.role.is_distinct_from("onboarded_user")],
+        )
+    )
+    provided = func.coalesce(UserEntry.phone_number, "") != ""
+    rules.append(
+        (
+            "phone_provided",
+            {"phone_provided": provided},
+            [UserEntry.phone_provided.is_distinct_from(provided)],
+        )
+    )
+    rules.append(
+        ("phone_verified", {"phone_verified": False}, [UserEntry.phone_verified.is_(None)])
+    )
+    return rules
+
+
+@dataclass
+class EnsureRolesReport:
+    rows_updated: dict[str, int] = field(default_factory=dict)
+    chunks: int = 0
+    duration_seconds: float = 0.0
+
+
+def _document(user: Any) -> UserDocument:
+    return UserDocument(
+        user.id, user.first_name, user.last_name, user.email, user.phone_number
+    )
+
+
 def _get_role(entry: UserEntry) -> str:
     return entry.role or "onboarded_user"
 
 
+@dataclass(frozen=True)
+class UserFilters:
+    role: Optional[str] = None
+    onboarded: Optional[bool] = None
+    phone_verified: Optional[bool] = None
+    # Users must have every listed permission flag set.
+    permissions: tuple[str, ...] = ()
+    # Users must have at least one of the listed flags set.
+    any_permissions: tuple[str, ...] = ()
+
+
+class LoadedUser(NamedTuple):
+    user: UserResponse
+    updated_at: datetime
+
+
+@dataclass(frozen=True)
+class UserPageVersion:
+    count: int
+    last_id: Optional[int]
+    last_updated_at: Optional[datetime]
+
+
+# UserResponse field -> UserEntry column, for projected listings.
+USER_FIELD_COLUMNS = {
+    name: name for name in UserResponse.model_fields if hasattr(UserEntry, name)
+}
+USER_FIELD_COLUMNS["permissions"] = "permission_bits"
+
+
+def export_field_names(fields: Sequence[str]) -> list[str]:
+    return _projected_columns(fields)[0]
+
+
+def _filter_clauses(filters: UserFilters) -> list:
+    clauses = []
+    if filters.role is not None:
+        if filters.role == "onboarded_user":
+            # role is NULL on legacy rows; _get_role reports them as onboarded_user.
+            clauses.append(
+                or_(UserEntry.role == filters.role, UserEntry.role.is_(None))
+            )
+        else:
+            clauses.append(UserEntry.role == filters.role)
+    if filters.onboarded is not None:
+        clauses.append(
+            UserEntry.onboarded_at.is_not(None)
+            if filters.onboarded
+            else UserEntry.onboarded_at.is_(None)
+        )
+    if filters.phone_verified is not None:
+        clauses.append(
+            UserEntry.phone_verified.is_(True)
+            if filters.phone_verified
+            else UserEntry.phone_verified.is_not(True)
+        )
+    clauses.extend(_permission_clause(name) for name in filters.permissions)
+    if filters.any_permissions:
+        # An OR of the per-flag predicates lets Postgres combine the partial
+        # indexes (BitmapOr) instead of scanning.
+        clauses.append(
+            or_(*(_permission_clause(name) for name in filters.any_permissions))
+        )
+    return clauses
+
+
+def _permission_clause(flag: str):
+    # The bit is inlined rather than bound so the predicate matches the
+    # partial index in migrations/005_users_permission_bits.sql.
+    bit = literal_column(str(PERMISSION_BITS[flag]))
+    return UserEntry.permission_bits.op("&")(bit) != literal_column("0")
+
+
+def _page_statement(
+    statement: Select,
+    filters: Optional[UserFilters],
+    limit: Optional[int],
+    after: Optional[int],
+) -> Select:
+    if filters is not None:
+        statement = statement.where(*_filter_clauses(filters))
+    if after is not None:
+        statement = statement.where(UserEntry.id > after)
+    statement = statement.order_by(UserEntry.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+def _projected_columns(fields: Sequence[str]) -> tuple[list[str], list]:
+    names = ["id", *(name for name in fields if name != "id")]
+    return names, [getattr(UserEntry, USER_FIELD_COLUMNS[name]) for name in names]
+
+
+def _row_values(names: Sequence[str], row: Any) -> tuple:
+    # Same defaults as _to_response, without building a model per row.
+    values = list(row)
+    for index, name in enumerate(names):
+        if name == "permissions":
+            values[index] = permission_dict(values[index])
+        elif name == "role":
+            values[index] = values[index] or "onboarded_user"
+        elif name == "phone_verified":
+            values[index] = bool(values[index])
+    return tuple(values)
+
+
+def _project_row(names: Sequence[str], row: Any) -> dict[str, Any]:
+    return dict(zip(names, _row_values(names, row)))
+
+
+def _permission_flags(permission_bits: Optional[int]) -> PermissionFlags:
+    return PermissionFlags.model_construct(**permission_dict(permission_bits))
+
+
+def _response_from_values(values: dict[str, Any]) -> UserResponse:
+    permissions = PermissionFlags.model_construct(**values["permissions"])
+    return UserResponse.model_construct(**{**values, "permissions": permissions})
+
+
+class UserCache:
+    # Per-id entries hold (UserResponse, updated_at); page entries hold list
+    # results keyed by the query. Every write bumps the generation: page keys
+    # include it, so all cached pages go stale at once, and a load that
+    # started before the write is not stored afterwards.
+    def __init__(self, users: TTLCache, pages: TTLCache) -> None:
+        self._users = users
+        self._pages = pages
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_user(self, user_id: int) -> Optional[LoadedUser]:
+        return self._users.get(user_id)
+
+    def set_user(
+        self, user_id: int, value: LoadedUser, generation: int
+    ) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._users.set(user_id, value)
+
+    def get_page(self, key: tuple) -> Optional[Any]:
+        return self._pages.get((self._generation, *key))
+
+    def set_page(self, key: tuple, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._pages.set((generation, *key), value)
+
+    def invalidate(self, *user_ids: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._users.pop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._users.clear()
+            self._pages.clear()
+
+    def stats(self) -> dict[str, CacheStats]:
+        return {"users": self._users.stats(), "pages": self._pages.stats()}
+
+
 class UserStore:
-    def get_user_for_identifier(self, identifier: str) -> Optional[UserEntry]:
+    def __init__(
+        self,
+        cache: UserCache,
+        search: Union[MemoryUserSearchIndex, PostgresUserSearch],
+    ) -> None:
+        self._cache = cache
+        self._search = search
+
+    def _written(self, session: Session, *documents: UserDocument) -> None:
+        # Invalidate and re-index once the write commits, so readers cannot
+        # re-cache or re-index the old row. A rollback still invalidates, in
+        # case the uncommitted row was cached by the same transaction.
+        user_ids = [document.id for document in documents]
+        after_commit(session, lambda: self._committed(user_ids, documents))
+        after_rollback(session, lambda: self._cache.invalidate(*user_ids))
+
+    def _committed(
+        self, user_ids: list[int], documents: Sequence[UserDocument]
+    ) -> None:
+        self._cache.invalidate(*user_ids)
+        self._search.index(documents)
+
+    def get_user_for_identifier(
+        self, identifier: str, session: Optional[Session] = None
+    ) -> Optional[UserEntry]:
         if "@" in identifier:
             key = _normalize_email(identifier)
             field = "email"
@@ -103,7 +471,7 @@ class UserStore:
             if key.startswith("0"):
                 raise ValueError("Phone number cannot start with 0")
 
-        with session_scope() as session:
+        with session_scope(session) as session:
             if field == "email":
                 result = session.execute(select(UserEntry).where(UserEntry.email == key))
             else:
@@ -113,24 +481,14 @@ class UserStore:
             entry = result.scalar_one_or_none()
             if entry is None:
                 return None
-            role = _role_for_email(entry.email)
-            if entry.role != role:
-                entry.role = role
-                entry.updated_at = datetime.now(timezone.utc)
-            if _apply_seed_profile(entry):
-                entry.updated_at = datetime.now(timezone.utc)
-            if _apply_phone_provided(entry):
-                entry.updated_at = datetime.now(timezone.utc)
-            if _ensure_phone_verified(entry):
-                entry.updated_at = datetime.now(timezone.utc)
-            if field == "phone_number" and entry.phone_number:
-                if entry.phone_verified is not True:
-                    entry.phone_verified = True
-                    entry.updated_at = datetime.now(timezone.utc)
-            session.flush()
-            return entry
-
-    def ensure_user_for_identifier(self, identifier: str) -> tuple[UserEntry, bool]:
+            changed = _normalize_login_entry(session, entry, field)
+        if changed:
+            self._written(session, _document(entry))
+        return entry
+
+    def ensure_user_for_identifier(
+        self, identifier: str, session: Optional[Session] = None
+    ) -> tuple[UserEntry, bool]:
         if "@" in identifier:
             key = _normalize_email(identifier)
             field = "email"
@@ -142,44 +500,39 @@ class UserStore:
             if key.startswith("0"):
                 raise ValueError("Phone number cannot start with 0")
 
-        with session_scope() as session:
-            if field == "email":
-                result = session.execute(select(UserEntry).where(UserEntry.email == key))
-            else:
-                result = session.execute(
-                    select(UserEntry).where(UserEntry.phone_number == key)
-                )
-            entry = result.scalar_one_or_none()
-            if entry:
-                role = _role_for_email(entry.email)
-                if entry.role != role:
-                    entry.role = role
-                    entry.updated_at = datetime.now(timezone.utc)
-                if _apply_seed_profile(entry):
-                    entry.updated_at = datetime.now(timezone.utc)
-                if _apply_phone_provided(entry):
-                    entry.updated_at = datetime.now(timezone.utc)
-                if _ensure_phone_verified(entry):
-                    entry.updated_at = datetime.now(timezone.utc)
-                if field == "phone_number" and entry.phone_number:
-                    if entry.phone_verified is not True:
-                        entry.phone_verified = True
-                        entry.updated_at = datetime.now(timezone.utc)
-                session.flush()
-                return entry, True
-
-            now = datetime.now(timezone.utc)
-            role = _role_for_email(key if field == "email" else None)
-            first_name, last_name = _seed_profile_for_email(
-                key if field == "email" else None
-            )
-            entry = UserEntry(
+        with session_scope(session) as session:
+            entry, existed, changed = self._provision(session, field, key)
+        if changed:
+            self._written(session, _document(entry))
+        return entry, existed
+
+    def _provision(
+        self, session: Session, field: str, key: str
+    ) -> tuple[UserEntry, bool, bool]:
+        # -> (entry, existed, whether the row was written)
+        entry = session.execute(
+            select(UserEntry).where(getattr(UserEntry, field) == key)
+        ).scalar_one_or_none()
+        if entry:
+            return entry, True, _normalize_login_entry(session, entry, field)
+
+        now = datetime.now(timezone.utc)
+        role = _role_for_email(key if field == "email" else None)
+        first_name, last_name = _seed_profile_for_email(
+            key if field == "email" else None
+        )
+        # Concurrent first logins race here; ON CONFLICT lets the loser
+        # fall through to the winner's row instead of a unique violation.
+        entry = session.scalars(
+            insert(UserEntry)
+            .values(
                 email=key if field == "email" else None,
                 first_name=first_name,
                 last_name=last_name,
                 country_code=None,
                 phone_number=key if field == "phone_number" else None,
                 permissions=None,
+                permission_bits=0,
                 role=role,
                 phone_provided=bool(field == "phone_number"),
                 phone_verified=bool(field == "phone_number"),
@@ -187,117 +540,203 @@ class UserStore:
                 updated_at=now,
                 onboarded_at=None,
             )
-            session.add(entry)
-            session.flush()
-            return entry, False
+            .on_conflict_do_nothing(index_elements=[getattr(UserEntry, field)])
+            .returning(UserEntry)
+        ).one_or_none()
+        if entry is not None:
+            return entry, False, True
+        entry = session.execute(
+            select(UserEntry).where(getattr(UserEntry, field) == key)
+        ).scalar_one()
+        return entry, True, _normalize_login_entry(session, entry, field)
 
     def create_user(
-        self, payload: UserCreate, phone_verified: bool = False
+        self,
+        payload: UserCreate,
+        phone_verified: bool = False,
+        session: Optional[Session] = None,
     ) -> UserResponse:
-        now = datetime.now(timezone.utc)
-        email = _normalize_email(payload.email) if payload.email else None
-        phone_number = payload.phone_number
-        country_code = _normalize_country_code(payload.country_code)
-        permissions = payload.permissions.model_dump()
+        values = _new_user_values(payload, phone_verified, datetime.now(timezone.utc))
+        with session_scope(session) as session:
+            entry = UserEntry(**values)
+            with _unique_violations(session):
+                session.add(entry)
+            user = self._to_response(entry)
+        self._written(session, _document(user))
+        return user
 
-        with session_scope() as session:
+    def bulk_create_users(
+        self,
+        rows: Sequence[tuple[int, UserCreate]],
+        chunk_size: int = 500,
+        session: Optional[Session] = None,
+    ) -> list[BulkUserResult]:
+        # rows are (index in the request, validated payload). Imported phone
+        # numbers are not OTP-verified, so they start unverified.
+        results: list[BulkUserResult] = []
+        pending: list[tuple[int, dict[str, Any]]] = []
+        seen_emails: set[str] = set()
+        seen_phones: set[str] = set()
+        now = datetime.now(timezone.utc)
+        for index, payload in rows:
+            values = _new_user_values(payload, False, now)
+            email, phone_number = values["email"], values["phone_number"]
+            if email in seen_emails or phone_number in seen_phones:
+                field_name = "Email" if email in seen_emails else "Phone number"
+                results.append(
+                    BulkUserResult(
+                        index=index,
+                        status="duplicate",
+                        error=f"{field_name} repeated earlier in this import",
+                    )
+                )
+                continue
             if email:
-                existing = session.execute(
-                    select(UserEntry).where(UserEntry.email == email)
-                ).scalar_one_or_none()
-                if existing:
-                    raise ValueError("Email already in use")
+                seen_emails.add(email)
             if phone_number:
-                existing_phone = session.execute(
-                    select(UserEntry).where(UserEntry.phone_number == phone_number)
-                ).scalar_one_or_none()
-                if existing_phone:
-                    raise ValueError("Phone number already in use")
-
-            entry = UserEntry(
-                email=email,
-                first_name=payload.first_name,
-                last_name=payload.last_name,
-                country_code=country_code,
-                phone_number=phone_number,
-                address=payload.address,
-                job_title=payload.job_title,
-                permissions=permissions,
-                role=_role_for_email(email),
-                phone_provided=bool(phone_number),
-                phone_verified=bool(phone_number) and phone_verified,
-                created_at=now,
-                updated_at=now,
-                onboarded_at=now if permissions else None,
+                seen_phones.add(phone_number)
+            pending.append((index, values))
+
+        for start in range(0, len(pending), max(1, chunk_size)):
+            chunk = pending[start : start + max(1, chunk_size)]
+            with session_scope(session) as scoped:
+                chunk_results = self._insert_chunk(scoped, chunk)
+            values_by_index = dict(chunk)
+            self._written(
+                scoped,
+                *(
+                    UserDocument(
+                        result.id,
+                        values_by_index[result.index]["first_name"],
+                        values_by_index[result.index]["last_name"],
+                        values_by_index[result.index]["email"],
+                        values_by_index[result.index]["phone_number"],
+                    )
+                    for result in chunk_results
+                    if result.status == "created"
+                )
+            )
+            results.extend(chunk_results)
+        results.sort(key=lambda result: result.index)
+        return results
+
+    def _insert_chunk(
+        self, session: Session, chunk: list[tuple[int, dict[str, Any]]]
+    ) -> list[BulkUserResult]:
+        emails = [values["email"] for _, values in chunk if values["email"]]
+        phones = [values["phone_number"] for _, values in chunk if values["phone_number"]]
+        taken_emails = set(
+            session.scalars(select(UserEntry.email).where(UserEntry.email.in_(emails)))
+            if emails
+            else ()
+        )
+        taken_phones = set(
+            session.scalars(
+                select(UserEntry.phone_number).where(UserEntry.phone_number.in_(phones))
             )
-            if _is_onboarded(entry):
-                entry.onboarded_at = now
-            session.add(entry)
-            session.flush()
-            return self._to_response(entry)
+            if phones
+            else ()
+        )
+        results = []
+        insertable = []
+        for index, values in chunk:
+            if values["email"] in taken_emails:
+                error = _UNIQUE_VIOLATIONS["email"]
+            elif values["phone_number"] in taken_phones:
+                error = _UNIQUE_VIOLATIONS["phone_number"]
+            else:
+                insertable.append((index, values))
+                continue
+            results.append(BulkUserResult(index=index, status="conflict", error=error))
+        if not insertable:
+            return results
+        try:
+            # One batched multi-row INSERT ... RETURNING (insertmanyvalues).
+            with session.begin_nested():
+                ids = session.scalars(
+                    insert(UserEntry).returning(UserEntry.id, sort_by_parameter_order=True),
+                    [values for _, values in insertable],
+                ).all()
+        except IntegrityError:
+            # Lost a race with a concurrent writer; settle this chunk row by row.
+            return results + [
+                self._insert_one(session, index, values) for index, values in insertable
+            ]
+        return results + [
+            BulkUserResult(index=index, status="created", id=user_id)
+            for (index, _), user_id in zip(insertable, ids)
+        ]
+
+    def _insert_one(
+        self, session: Session, index: int, values: dict[str, Any]
+    ) -> BulkUserResult:
+        entry = UserEntry(**values)
+        try:
+            with _unique_violations(session):
+                session.add(entry)
+        except ValueError as exc:
+            return BulkUserResult(index=index, status="conflict", error=str(exc))
+        return BulkUserResult(index=index, status="created", id=entry.id)
 
-    def update_user(self, user_id: int, payload: UserCreate) -> UserResponse:
+    def update_user(
+        self, user_id: int, payload: UserCreate, session: Optional[Session] = None
+    ) -> UserResponse:
         now = datetime.now(timezone.utc)
         email = _normalize_email(payload.email) if payload.email else None
         phone_number = payload.phone_number
         country_code = _normalize_country_code(payload.country_code)
         permissions = payload.permissions.model_dump()
 
-        with session_scope() as session:
+        with session_scope(session) as session:
             entry = session.get(UserEntry, user_id)
             if entry is None:
                 raise ValueError("User not found")
 
-            if email and email != entry.email:
-                existing = session.execute(
-                    select(UserEntry).where(UserEntry.email == email)
-                ).scalar_one_or_none()
-                if existing and existing.id != user_id:
-                    raise ValueError("Email already in use")
-                entry.email = email
-                entry.role = _role_for_email(entry.email)
-
-            phone_changed = phone_number != entry.phone_number
-            country_changed = country_code != entry.country_code
-            if phone_changed or country_changed:
-                if phone_number:
-                    existing_phone = session.execute(
-                        select(UserEntry).where(UserEntry.phone_number == phone_number)
-                    ).scalar_one_or_none()
-                    if existing_phone and existing_phone.id != user_id:
-                        raise ValueError("Phone number already in use")
-                entry.phone_number = phone_number
-                entry.country_code = country_code if phone_number else None
-                entry.phone_verified = False
-            if not phone_number:
-                entry.country_code = None
-                entry.phone_verified = False
-
-            entry.first_name = payload.first_name
-            entry.last_name = payload.last_name
-            entry.address = payload.address
-            entry.job_title = payload.job_title
-            entry.permissions = permissions
-            entry.updated_at = now
-            if entry.role is None:
-                entry.role = _role_for_email(entry.email)
-            _apply_seed_profile(entry)
-            _apply_phone_provided(entry)
-            _ensure_phone_verified(entry)
-            if _is_onboarded(entry) and entry.onboarded_at is None:
-                entry.onboarded_at = now
-
-            session.flush()
-            return self._to_response(entry)
+            with _unique_violations(session):
+                if email and email != entry.email:
+                    entry.email = email
+                    entry.role = _role_for_email(entry.email)
+
+                phone_changed = phone_number != entry.phone_number
+                country_changed = country_code != entry.country_code
+                if phone_changed or country_changed:
+                    entry.phone_number = phone_number
+                    entry.country_code = country_code if phone_number else None
+                    entry.phone_verified = False
+                if not phone_number:
+                    entry.country_code = None
+                    entry.phone_verified = False
+
+                entry.first_name = payload.first_name
+                entry.last_name = payload.last_name
+                entry.address = payload.address
+                entry.job_title = payload.job_title
+                entry.permissions = permissions
+                entry.permission_bits = permission_mask(permissions)
+                entry.updated_at = now
+                if entry.role is None:
+                    entry.role = _role_for_email(entry.email)
+                _apply_seed_profile(entry)
+                _apply_phone_provided(entry)
+                _ensure_phone_verified(entry)
+                if _is_onboarded(entry) and entry.onboarded_at is None:
+                    entry.onboarded_at = now
+            user = self._to_response(entry)
+        self._written(session, _document(user))
+        return user
 
     def is_phone_verified(
-        self, user_id: int, phone_number: Optional[str], country_code: Optional[str]
+        self,
+        user_id: int,
+        phone_number: Optional[str],
+        country_code: Optional[str],
+        session: Optional[Session] = None,
     ) -> bool:
         if not phone_number:
             return False
         normalized = _normalize_phone(phone_number)
         normalized_country = _normalize_country_code(country_code)
-        with session_scope() as session:
+        with session_scope(session) as session:
             entry = session.get(UserEntry, user_id)
             if entry is None:
                 raise ValueError("User not found")
@@ -312,10 +751,11 @@ class UserStore:
         phone_number: str,
         country_code: Optional[str],
         exclude_user_id: Optional[int] = None,
+        session: Optional[Session] = None,
     ) -> bool:
         normalized = _normalize_phone(phone_number)
         normalized_country = _normalize_country_code(country_code)
-        with session_scope() as session:
+        with session_scope(session) as session:
             entry = session.execute(
                 select(UserEntry).where(UserEntry.phone_number == normalized)
             ).scalar_one_or_none()
@@ -328,43 +768,230 @@ class UserStore:
             return True
 
     def verify_phone(
-        self, user_id: int, phone_number: str, country_code: Optional[str]
+        self,
+        user_id: int,
+        phone_number: str,
+        country_code: Optional[str],
+        session: Optional[Session] = None,
     ) -> UserResponse:
         normalized = _normalize_phone(phone_number)
         normalized_country = _normalize_country_code(country_code)
         now = datetime.now(timezone.utc)
-        with session_scope() as session:
+        with session_scope(session) as session:
             entry = session.get(UserEntry, user_id)
             if entry is None:
                 raise ValueError("User not found")
-            if normalized != entry.phone_number:
-                existing_phone = session.execute(
-                    select(UserEntry).where(UserEntry.phone_number == normalized)
-                ).scalar_one_or_none()
-                if existing_phone and existing_phone.id != user_id:
-                    raise ValueError("Phone number already in use")
+            with _unique_violations(session):
                 entry.phone_number = normalized
-            entry.country_code = normalized_country
-            entry.phone_provided = bool(normalized)
-            entry.phone_verified = True
-            entry.updated_at = now
-            session.flush()
-            return self._to_response(entry)
-
-    def list_users(self) -> list[UserResponse]:
-        with session_scope() as session:
-            result = session.execute(select(UserEntry).order_by(UserEntry.id))
-            entries = result.scalars().all()
-            return [self._to_response(entry) for entry in entries]
+                entry.country_code = normalized_country
+                entry.phone_provided = bool(normalized)
+                entry.phone_verified = True
+                entry.updated_at = now
+            user = self._to_response(entry)
+        self._written(session, _document(user))
+        return user
+
+    def list_users(
+        self,
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        session: Optional[Session] = None,
+    ) -> list[UserResponse]:
+        key = ("users", filters, limit, after)
+        cached = self._cache.get_page(key)
+        if cached is not None:
+            return cached
+        generation = self._cache.generation
+        names, columns = _projected_columns(USER_FIELD_COLUMNS)
+        statement = _page_statement(select(*columns), filters, limit, after)
+        with session_scope(session) as session:
+            rows = session.execute(statement).all()
+        users = [_response_from_values(_project_row(names, row)) for row in rows]
+        self._cache.set_page(key, users, generation)
+        return users
+
+    def list_user_fields(
+        self,
+        fields: Sequence[str],
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        session: Optional[Session] = None,
+    ) -> list[dict[str, Any]]:
+        cached = self.cached_user_fields(fields, filters, limit, after)
+        if cached is not None:
+            return cached
+        generation = self._cache.generation
+        names, columns = _projected_columns(fields)
+        statement = _page_statement(select(*columns), filters, limit, after)
+        with session_scope(session) as session:
+            rows = session.execute(statement).all()
+        projected = [_project_row(names, row) for row in rows]
+        self._cache.set_page(
+            ("fields", tuple(fields), filters, limit, after), projected, generation
+        )
+        return projected
 
-    def get_user(self, user_id: int) -> Optional[UserResponse]:
+    def cached_user_fields(
+        self,
+        fields: Sequence[str],
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Optional[list[dict[str, Any]]]:
+        return self._cache.get_page(("fields", tuple(fields), filters, limit, after))
+
+    def iter_user_rows(
+        self,
+        fields: Sequence[str],
+        filters: Optional[UserFilters] = None,
+        chunk_size: int = 1000,
+    ) -> Iterator[list[tuple]]:
+        # Yields chunks of value tuples (in the order of export_field_names)
+        # read through a server-side cursor, so memory stays at one chunk.
+        names, columns = _projected_columns(fields)
+        statement = _page_statement(select(*columns), filters, None, None)
+        statement = statement.execution_options(yield_per=chunk_size)
         with session_scope() as session:
+            for partition in session.execute(statement).partitions():
+                yield [_row_values(names, row) for row in partition]
+
+    def get_user(
+        self, user_id: int, session: Optional[Session] = None
+    ) -> Optional[UserResponse]:
+        loaded = self.load_user(user_id, session=session)
+        return loaded.user if loaded else None
+
+    def get_user_version(
+        self, user_id: int, session: Optional[Session] = None
+    ) -> Optional[datetime]:
+        # A primary-key hit loads the whole row, which also warms the cache
+        # for the get_user that follows a changed version.
+        loaded = self.load_user(user_id, session=session)
+        return loaded.updated_at if loaded else None
+
+    def load_user(
+        self, user_id: int, session: Optional[Session] = None
+    ) -> Optional[LoadedUser]:
+        return self.cached_user(user_id) or self._load_user(user_id, session=session)
+
+    def cached_user(self, user_id: int) -> Optional[LoadedUser]:
+        return self._cache.get_user(user_id)
+
+    def _load_user(
+        self, user_id: int, session: Optional[Session] = None
+    ) -> Optional[LoadedUser]:
+        generation = self._cache.generation
+        with session_scope(session) as session:
             entry = session.get(UserEntry, user_id)
             if entry is None:
                 return None
-            return self._to_response(entry)
+            loaded = LoadedUser(self._to_response(entry), entry.updated_at)
+        self._cache.set_user(user_id, loaded, generation)
+        return loaded
+
+    def get_users_by_ids(
+        self, user_ids: Sequence[int], session: Optional[Session] = None
+    ) -> list[UserResponse]:
+        # Cached users are reused; the rest are loaded with one IN query.
+        # Keeps the order of user_ids and skips ids that no longer exist.
+        found = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.cached_user(user_id)
+            if cached is not None:
+                found[user_id] = cached.user
+            else:
+                missing.append(user_id)
+        if missing:
+            generation = self._cache.generation
+            with session_scope(session) as session:
+                entries = session.scalars(
+                    select(UserEntry).where(UserEntry.id.in_(missing))
+                ).all()
+                for entry in entries:
+                    loaded = LoadedUser(self._to_response(entry), entry.updated_at)
+                    self._cache.set_user(entry.id, loaded, generation)
+                    found[entry.id] = loaded.user
+        return [found[user_id] for user_id in user_ids if user_id in found]
+
+    def search_users(
+        self, query: str, limit: int, session: Optional[Session] = None
+    ) -> list[UserResponse]:
+        user_ids = self._search.search(query, limit, session=session)
+        return self.get_users_by_ids(user_ids, session=session)
+
+    def cached_search(self, query: str, limit: int) -> Optional[list[UserResponse]]:
+        # Answer from memory only: a built in-memory index and cached users.
+        if not isinstance(self._search, MemoryUserSearchIndex) or not self._search.ready:
+            return None
+        users = []
+        for user_id in self._search.search(query, limit):
+            cached = self.cached_user(user_id)
+            if cached is None:
+                return None
+            users.append(cached.user)
+        return users
+
+    def search_index_needs_rebuild(self) -> bool:
+        return self._search.needs_rebuild
+
+    def rebuild_search_index(self) -> bool:
+        # Background only (app.main); reads in its own transaction.
+        return self._search.rebuild(self._search_documents)
+
+    def _search_documents(
+        self, session: Optional[Session] = None
+    ) -> Iterator[UserDocument]:
+        statement = select(
+            UserEntry.id,
+            UserEntry.first_name,
+            UserEntry.last_name,
+            UserEntry.email,
+            UserEntry.phone_number,
+        ).execution_options(yield_per=5000)
+        with session_scope(session) as session:
+            for row in session.execute(statement):
+                yield UserDocument(*row)
+
+    def list_users_version(
+        self,
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        session: Optional[Session] = None,
+    ) -> UserPageVersion:
+        cached = self.cached_users_version(filters, limit, after)
+        if cached is not None:
+            return cached
+        generation = self._cache.generation
+        # Aggregates over the same page list_user_fields would return, without
+        # fetching its rows.
+        page = _page_statement(
+            select(UserEntry.id, UserEntry.updated_at), filters, limit, after
+        ).subquery()
+        statement = select(func.count(), func.max(page.c.id), func.max(page.c.updated_at))
+        with session_scope(session) as session:
+            count, last_id, last_updated_at = session.execute(statement).one()
+        version = UserPageVersion(count, last_id, last_updated_at)
+        self._cache.set_page(("version", filters, limit, after), version, generation)
+        return version
+
+    def cached_users_version(
+        self,
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Optional[UserPageVersion]:
+        return self._cache.get_page(("version", filters, limit, after))
+
+    def cache_stats(self) -> dict[str, CacheStats]:
+        return self._cache.stats()
 
-    def exists_by_identifier(self, identifier: str) -> bool:
+    def exists_by_identifier(
+        self, identifier: str, session: Optional[Session] = None
+    ) -> bool:
         if not identifier:
             return False
         if "@" in identifier:
@@ -373,40 +1000,65 @@ class UserStore:
         else:
             key = _normalize_phone(identifier)
             field = UserEntry.phone_number
-        with session_scope() as session:
+        with session_scope(session) as session:
             result = session.execute(select(UserEntry).where(field == key))
             return result.scalar_one_or_none() is not None
 
-    def ensure_roles(self) -> None:
+    def ensure_roles(
+        self, chunk_size: Optional[int] = None, session: Optional[Session] = None
+    ) -> EnsureRolesReport:
+        # Set-based reconciliation in keyset-ordered id ranges; each range is
+        # its own transaction unless the caller passes a session.
+        chunk_size = chunk_size or settings.ensure_roles_chunk_size
+        started = time.perf_counter()
         now = datetime.now(timezone.utc)
-        with session_scope() as session:
-            entries = session.execute(select(UserEntry)).scalars().all()
-            for entry in entries:
-                role = _role_for_email(entry.email)
-                updated = False
-                if entry.role != role:
-                    entry.role = role
-                    updated = True
-                if _apply_seed_profile(entry):
-                    updated = True
-                if _apply_phone_provided(entry):
-                    updated = True
-                if _ensure_phone_verified(entry):
-                    updated = True
-                if updated:
-                    entry.updated_at = now
-            session.flush()
+        rules = _reconcile_rules()
+        report = EnsureRolesReport(rows_updated={name: 0 for name, _, _ in rules})
+        lower_id = 0
+        while True:
+            with session_scope(session) as scoped:
+                upper_id = scoped.execute(
+                    select(UserEntry.id)
+                    .where(UserEntry.id > lower_id)
+                    .order_by(UserEntry.id)
+                    .offset(chunk_size - 1)
+                    .limit(1)
+                ).scalar()
+                in_chunk = [UserEntry.id > lower_id]
+                if upper_id is not None:
+                    in_chunk.append(UserEntry.id <= upper_id)
+                for name, values, conditions in rules:
+                    result = scoped.execute(
+                        update(UserEntry)
+                        .where(*in_chunk, *conditions)
+                        .values(**values, updated_at=now)
+                        .execution_options(synchronize_session=False)
+                    )
+                    report.rows_updated[name] += result.rowcount
+            report.chunks += 1
+            if upper_id is None:
+                break
+            lower_id = upper_id
+        report.duration_seconds = time.perf_counter() - started
+        if any(report.rows_updated.values()):
+            after_commit(scoped, self._reconciled)
+        return report
+
+    def _reconciled(self) -> None:
+        self._cache.clear()
+        self._search.mark_stale()
 
     def _to_response(self, entry: UserEntry) -> UserResponse:
-        permissions = entry.permissions or {}
-        return UserResponse(
+        # Rows come from our own schema; building without validation is safe
+        # and several times cheaper than UserResponse(...).
+        return UserResponse.model_construct(
             id=entry.id,
             first_name=entry.first_name,
             last_name=entry.last_name,
             phone_number=entry.phone_number,
             address=entry.address,
             job_title=entry.job_title,
-            permissions=PermissionFlags(**permissions),
+            permissions=_permission_flags(entry.permission_bits),
             email=entry.email,
             role=_get_role(entry),
             country_code=entry.country_code,
@@ -416,4 +1068,168 @@ class UserStore:
         )
 
 
-user_store = UserStore()
+class AsyncUserStore:
+    # Every method takes the request's UnitOfWork (app.dependencies.get_db);
+    # without one each call runs in its own transaction.
+    def __init__(self, store: UserStore) -> None:
+        self._store = store
+
+    async def get_user_for_identifier(
+        self, identifier: str, db: Optional[UnitOfWork] = None
+    ) -> Optional[UserEntry]:
+        return await run_db(self._store.get_user_for_identifier, identifier, db=db)
+
+    async def ensure_user_for_identifier(
+        self, identifier: str, db: Optional[UnitOfWork] = None
+    ) -> tuple[UserEntry, bool]:
+        return await run_db(self._store.ensure_user_for_identifier, identifier, db=db)
+
+    async def create_user(
+        self,
+        payload: UserCreate,
+        phone_verified: bool = False,
+        db: Optional[UnitOfWork] = None,
+    ) -> UserResponse:
+        return await run_db(
+            self._store.create_user, payload, phone_verified=phone_verified, db=db
+        )
+
+    async def bulk_create_users(
+        self,
+        rows: Sequence[tuple[int, UserCreate]],
+        chunk_size: int = 500,
+        db: Optional[UnitOfWork] = None,
+    ) -> list[BulkUserResult]:
+        return await run_db(self._store.bulk_create_users, rows, chunk_size, db=db)
+
+    async def update_user(
+        self, user_id: int, payload: UserCreate, db: Optional[UnitOfWork] = None
+    ) -> UserResponse:
+        return await run_db(self._store.update_user, user_id, payload, db=db)
+
+    async def is_phone_verified(
+        self,
+        user_id: int,
+        phone_number: Optional[str],
+        country_code: Optional[str],
+        db: Optional[UnitOfWork] = None,
+    ) -> bool:
+        return await run_db(
+            self._store.is_phone_verified, user_id, phone_number, country_code, db=db
+        )
+
+    async def is_phone_in_use(
+        self,
+        phone_number: str,
+        country_code: Optional[str],
+        exclude_user_id: Optional[int] = None,
+        db: Optional[UnitOfWork] = None,
+    ) -> bool:
+        return await run_db(
+            self._store.is_phone_in_use,
+            phone_number,
+            country_code,
+            exclude_user_id=exclude_user_id,
+            db=db,
+        )
+
+    async def verify_phone(
+        self,
+        user_id: int,
+        phone_number: str,
+        country_code: Optional[str],
+        db: Optional[UnitOfWork] = None,
+    ) -> UserResponse:
+        return await run_db(
+            self._store.verify_phone, user_id, phone_number, country_code, db=db
+        )
+
+    async def list_users(
+        self,
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        db: Optional[UnitOfWork] = None,
+    ) -> list[UserResponse]:
+        return await run_db(self._store.list_users, filters, limit, after, db=db)
+
+    async def list_user_fields(
+        self,
+        fields: Sequence[str],
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        db: Optional[UnitOfWork] = None,
+    ) -> list[dict[str, Any]]:
+        # Cache hits are answered inline, without a threadpool/DB round trip.
+        cached = self._store.cached_user_fields(fields, filters, limit, after)
+        if cached is not None:
+            return cached
+        return await run_db(
+            self._store.list_user_fields, fields, filters, limit, after, db=db
+        )
+
+    async def get_user(
+        self, user_id: int, db: Optional[UnitOfWork] = None
+    ) -> Optional[UserResponse]:
+        loaded = await self.load_user(user_id, db=db)
+        return loaded.user if loaded else None
+
+    async def get_user_version(
+        self, user_id: int, db: Optional[UnitOfWork] = None
+    ) -> Optional[datetime]:
+        loaded = await self.load_user(user_id, db=db)
+        return loaded.updated_at if loaded else None
+
+    async def load_user(
+        self, user_id: int, db: Optional[UnitOfWork] = None
+    ) -> Optional[LoadedUser]:
+        cached = self._store.cached_user(user_id)
+        if cached is not None:
+            return cached
+        return await run_db(self._store.load_user, user_id, db=db)
+
+    async def list_users_version(
+        self,
+        filters: Optional[UserFilters] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        db: Optional[UnitOfWork] = None,
+    ) -> UserPageVersion:
+        cached = self._store.cached_users_version(filters, limit, after)
+        if cached is not None:
+            return cached
+        return await run_db(
+            self._store.list_users_version, filters, limit, after, db=db
+        )
+
+    async def search_users(
+        self, query: str, limit: int, db: Optional[UnitOfWork] = None
+    ) -> list[UserResponse]:
+        cached = self._store.cached_search(query, limit)
+        if cached is not None:
+            return cached
+        return await run_db(self._store.search_users, query, limit, db=db)
+
+    async def exists_by_identifier(
+        self, identifier: str, db: Optional[UnitOfWork] = None
+    ) -> bool:
+        return await run_db(self._store.exists_by_identifier, identifier, db=db)
+
+
+def _build_search() -> Union[MemoryUserSearchIndex, PostgresUserSearch]:
+    if settings.user_search_backend == "memory":
+        return MemoryUserSearchIndex(settings.user_search_rebuild_seconds)
+    if settings.user_search_backend == "postgres":
+        return PostgresUserSearch()
+    raise RuntimeError(f"Unknown USER_SEARCH_BACKEND: {settings.user_search_backend}")
+
+
+user_store = UserStore(
+    UserCache(
+        users=TTLCache(settings.user_cache_size, settings.user_cache_ttl_seconds),
+        pages=TTLCache(settings.user_page_cache_size, settings.user_cache_ttl_seconds),
+    ),
+    _build_search(),
+)
+async_user_store = AsyncUserStore(user_store)
@@ -0,0 +1,194 @@
+import logging
+import re
+import sys
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LOGGER = logging.getLogger(__name__)
+
+_APP_ROOT = str(Path(__file__).resolve().parent)
+_REPO_ROOT = str(Path(__file__).resolve().parents[1])
+_THIS_FILE = str(Path(__file__).resolve())
+# Plumbing frames; only reported when no other app frame is on the stack
+# (e.g. a flush during UnitOfWork.commit).
+_PLUMBING_FILES = {
+    _THIS_FILE,
+    str(Path(__file__).resolve().parent / "database.py"),
+    str(Path(__file__).resolve().parent / "metrics.py"),
+}
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w%])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\([^)]*\)s|%s|\$\d+|\?")
+_CAST = r"(?:::[A-Z][A-Z ]*?)?"
+# "IN (?, ?, ?)" and multi-row VALUES collapse so batches of any size group
+# together.
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*\?{_CAST}(?:\s*,\s*\?{_CAST})+\s*\)")
+_ROW_LIST = re.compile(r"\(\?(?:, \.\.\.)?\)(?:\s*,\s*\(\?(?:, \.\.\.)?\))+")
+
+
+class QueryTrace:
+    # Statements run on behalf of one request. The middleware puts a fresh
+    # trace in the context; threadpool calls see the same object because
+    # anyio copies the context into the worker thread.
+    def __init__(self, request: str = "") -> None:
+        self.request = request
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: dict[str, list] = {}
+
+    def record(self, sql: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def top(self, limit: int) -> list[tuple[str, int, float]]:
+        ranked = sorted(
+            self.statements.items(), key=lambda item: (-item[1][0], -item[1][1])
+        )
+        return [(sql, count, seconds) for sql, (count, seconds) in ranked[:limit]]
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar(
+    "query_trace", default=None
+)
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current_trace.get()
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(?, ...)", sql)
+    return _ROW_LIST.sub("(?, ...), ...", sql)
+
+
+def call_site() -> str:
+    fallback = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_ROOT):
+            if filename not in _PLUMBING_FILES:
+                return _describe(frame)
+            if fallback is None and filename != _THIS_FILE:
+                fallback = frame
+        frame = frame.f_back
+    return _describe(fallback) if fallback is not None else "unknown"
+
+
+def _describe(frame) -> str:
+    relative = frame.f_code.co_filename[len(_REPO_ROOT) + 1 :]
+    return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+class QueryTracer:
+    def __init__(self, slow_query_ms: float) -> None:
+        self._slow_seconds = slow_query_ms / 1000 if slow_query_ms > 0 else None
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info["trace_started"].pop()
+        self._finished(statement, time.perf_counter() - started, failed=False)
+
+    def _error(self, context) -> None:
+        # A failed statement never reaches after_cursor_execute; pop its start
+        # here, or the stack on the pooled connection grows without bound.
+        conn = context.connection
+        stack = conn.info.get("trace_started") if conn is not None else None
+        if not stack or context.statement is None:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        self._finished(context.statement, elapsed, failed=True)
+
+    def _finished(self, statement: str, elapsed: float, failed: bool) -> None:
+        trace = _current_trace.get()
+        slow = self._slow_seconds is not None and elapsed >= self._slow_seconds
+        if trace is None and not slow:
+            return
+        sql = normalize_sql(statement)
+        if trace is not None:
+            trace.record(sql, elapsed)
+        if slow:
+            # Flushes during commit have no app frame; the request still
+            # says where they came from.
+            site = call_site()
+            if trace is not None:
+                site = f"{site} during {trace.request}"
+            LOGGER.warning(
+                "slow %s %.1fms at %s: %s",
+                "failed query" if failed else "query",
+                elapsed * 1000,
+                site,
+                sql,
+            )
+
+
+class ServerTimingMiddleware:
+    # Adds "Server-Timing: db;dur=<ms>, db-count;desc=<n>" and logs requests
+    # that run more than query_warn statements, with the most repeated ones
+    # (N+1 loops, per-request sweeps).
+    def __init__(self, app: ASGIApp, query_warn: int = 0) -> None:
+        self.app = app
+        self._query_warn = query_warn
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = QueryTrace(f"{scope['method']} {scope['path']}")
+        token = _current_trace.set(trace)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f"db;dur={trace.seconds * 1000:.2f}, db-count;desc={trace.count}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            if self._query_warn > 0 and trace.count > self._query_warn:
+                self._log_heavy(trace)
+
+    def _log_heavy(self, trace: QueryTrace) -> None:
+        repeated = "; ".join(
+            f"{count}x {seconds * 1000:.1f}ms {sql}"
+            for sql, count, seconds in trace.top(3)
+        )
+        LOGGER.warning(
+            "%s ran %s statements in %.1fms; most repeated: %s",
+            trace.request,
+            trace.count,
+            trace.seconds * 1000,
+            repeated,
+        )
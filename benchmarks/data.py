@@ -0,0 +1,64 @@
+# Synthetic, deterministic rows for the benchmarks. Emails use the reserved
+# example.invalid domain so they cannot collide with real users.
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
+
+from app.models.user import PERMISSION_FLAGS, permission_mask
+
+_FIRST_NAMES = ("Ava", "Liam", "Noah", "Emma", "Mia", "Lucas", "Zoe", "Omar", "Ivy", "Kai")
+_LAST_NAMES = ("Smith", "Garcia", "Chen", "Patel", "Okafor", "Novak", "Silva", "Kim")
+_JOB_TITLES = ("Estimator", "Project Manager", "Sales", "Installer", None)
+
+
+def permissions(rng: random.Random) -> dict[str, bool]:
+    return {flag: rng.random() < 0.25 for flag in PERMISSION_FLAGS}
+
+
+def user_rows(
+    start: int, count: int, seed: int = 1, tag: str = "bench"
+) -> Iterator[dict[str, Any]]:
+    # Insert-ready users rows numbered start .. start + count - 1; ids are left
+    # to the database so its sequence stays in step.
+    rng = random.Random(seed + start)
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for index in range(start, start + count):
+        flags = permissions(rng)
+        onboarded = rng.random() < 0.8
+        at = created + timedelta(seconds=index)
+        yield dict(
+            email=f"{tag}-{index}@example.invalid",
+            first_name=rng.choice(_FIRST_NAMES),
+            last_name=rng.choice(_LAST_NAMES),
+            country_code="+1",
+            phone_number=f"9{index:09d}",
+            address=f"{index} Pool Lane",
+            job_title=rng.choice(_JOB_TITLES),
+            permissions=flags,
+            permission_bits=permission_mask(flags),
+            role="onboarded_user" if onboarded else "new_user",
+            phone_provided=True,
+            phone_verified=rng.random() < 0.7,
+            created_at=at,
+            updated_at=at,
+            onboarded_at=at if onboarded else None,
+        )
+
+
+def user_payloads(count: int, seed: int = 2) -> list[dict[str, Any]]:
+    # Request bodies for POST /api/users (UserCreate), as the client sends them.
+    rng = random.Random(seed)
+    return [
+        {
+            "first_name": f"  {rng.choice(_FIRST_NAMES)} ",
+            "last_name": rng.choice(_LAST_NAMES),
+            "country_code": "+1",
+            "phone_number": f"8{index % 100:02d}555{index % 10000:04d}",
+            "address": f"{index} Pool Lane",
+            "job_title": rng.choice(_JOB_TITLES),
+            # UserCreate requires at least one permission.
+            "permissions": {**permissions(rng), "sales_marketing": True},
+            "email": f"payload-{index}@example.invalid",
+        }
+        for index in range(count)
+    ]
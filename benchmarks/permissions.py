@@ -0,0 +1,177 @@
+# Permission decode cost and filtered-query latency, JSON column vs bitmask.
+# The decode half needs no database. --query also times GET /api/users style
+# filtered pages against DATABASE_URL: synthetic users are inserted inside a
+# transaction that is rolled back, so the database is left as it was.
+#
+#     python -m benchmarks.permissions --rows 1000 --repeat 20
+#     python -m benchmarks.permissions --query --users 100000
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from sqlalchemy import func, insert, or_, select, text  # noqa: E402
+
+from app.models.user import (  # noqa: E402
+    PERMISSION_FLAGS,
+    UserEntry,
+    permission_dict,
+    permission_mask,
+)
+from app.schemas.users import PermissionFlags  # noqa: E402
+from app.services.users import (  # noqa: E402
+    UserFilters,
+    _page_statement,
+    _permission_flags,
+)
+
+
+def _permissions(rng: random.Random) -> dict[str, bool]:
+    return {flag: rng.random() < 0.25 for flag in PERMISSION_FLAGS}
+
+
+def _decode_json(raw: list[str]) -> int:
+    # What loading the JSON column cost: driver json.loads, then the dict walk
+    # in the old _permission_flags.
+    count = 0
+    for value in raw:
+        permissions = json.loads(value) or {}
+        PermissionFlags.model_construct(
+            **{flag: bool(permissions.get(flag)) for flag in PERMISSION_FLAGS}
+        )
+        count += 1
+    return count
+
+
+def _decode_bits(masks: list[int]) -> int:
+    count = 0
+    for mask in masks:
+        _permission_flags(mask)
+        count += 1
+    return count
+
+
+def _measure(fn: Callable[[], object], repeat: int) -> float:
+    fn()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _decode(rows: int, repeat: int) -> None:
+    rng = random.Random(1)
+    permissions = [_permissions(rng) for _ in range(rows)]
+    raw = [json.dumps(value) for value in permissions]
+    masks = [permission_mask(value) for value in permissions]
+    assert all(
+        permission_dict(mask) == value for mask, value in zip(masks, permissions)
+    )
+    before = _measure(lambda: _decode_json(raw), repeat) / rows * 1_000_000
+    after = _measure(lambda: _decode_bits(masks), repeat) / rows * 1_000_000
+    print(f"decode rows={rows} repeat={repeat}")
+    print(f"  json     {before:8.2f} us/row")
+    print(f"  bitmask  {after:8.2f} us/row  ({before / after:.1f}x)")
+
+
+def _json_clause(flag: str):
+    return UserEntry.permissions[flag].as_string() == "true"
+
+
+def _query(users: int, repeat: int, page_size: int) -> None:
+    from app.database import engine
+
+    rng = random.Random(2)
+    now = datetime.now(timezone.utc)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            start = connection.execute(
+                select(func.coalesce(func.max(UserEntry.id), 0))
+            ).scalar_one()
+            batch = []
+            for index in range(users):
+                permissions = _permissions(rng)
+                batch.append(
+                    dict(
+                        id=start + index + 1,
+                        email=f"permissions-benchmark-{index}@example.invalid",
+                        permissions=permissions,
+                        permission_bits=permission_mask(permissions),
+                        role="onboarded_user",
+                        created_at=now,
+                        updated_at=now,
+                    )
+                )
+                if len(batch) == 5000:
+                    connection.execute(insert(UserEntry), batch)
+                    batch = []
+            if batch:
+                connection.execute(insert(UserEntry), batch)
+            # The JSON expression indexes dropped by migration 005, so both
+            # sides are index-backed.
+            for flag in PERMISSION_FLAGS:
+                connection.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS ix_benchmark_perm_{flag}_id "
+                        f"ON users (id) WHERE (permissions ->> '{flag}') = 'true'"
+                    )
+                )
+            connection.execute(text("ANALYZE users"))
+
+            cases = {
+                "one flag": (("view_admin_panel",), ()),
+                "two flags": (("sales_marketing", "project_management"), ()),
+                "any of two": ((), ("access_other_users", "view_admin_panel")),
+            }
+            print(f"query users={users} repeat={repeat} page_size={page_size}")
+            for name, (all_flags, any_flags) in cases.items():
+                filters = UserFilters(permissions=all_flags, any_permissions=any_flags)
+                bits = _page_statement(
+                    select(UserEntry.id, UserEntry.permission_bits),
+                    filters,
+                    page_size,
+                    None,
+                )
+                legacy = select(UserEntry.id, UserEntry.permissions).where(
+                    *(_json_clause(flag) for flag in all_flags)
+                )
+                if any_flags:
+                    legacy = legacy.where(
+                        or_(*(_json_clause(flag) for flag in any_flags))
+                    )
+                legacy = legacy.order_by(UserEntry.id).limit(page_size)
+                for label, statement in (("json", legacy), ("bitmask", bits)):
+                    elapsed = _measure(
+                        lambda: connection.execute(statement).all(), repeat
+                    )
+                    print(f"  {name:<11} {label:<8} {elapsed * 1000:8.3f} ms/page")
+        finally:
+            transaction.rollback()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Permission decode and filter cost, JSON vs bitmask"
+    )
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--query", action="store_true", help="also time queries")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    _decode(args.rows, args.repeat)
+    if args.query:
+        _query(args.users, args.repeat, args.page_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Per-row cost of serializing GET /api/users pages, before vs after the fast
+# path. No database is needed; rows are synthetic.
+#
+#     python -m benchmarks.serialization --rows 1000 --repeat 20
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.models.user import permission_dict, permission_mask  # noqa: E402
+from app.responses import FastJSONResponse, orjson  # noqa: E402
+from app.schemas.users import PermissionFlags, UserResponse  # noqa: E402
+from app.services.users import (  # noqa: E402
+    USER_FIELD_COLUMNS,
+    _project_row,
+    user_store,
+)
+
+FIELDS = list(USER_FIELD_COLUMNS)
+_PERMISSIONS = FIELDS.index("permissions")
+
+
+def _entry(row: tuple, **overrides) -> SimpleNamespace:
+    return SimpleNamespace(**{**dict(zip(FIELDS, row)), **overrides})
+
+
+def _rows(count: int) -> list[tuple]:
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for index in range(1, count + 1):
+        values = {
+            "id": index,
+            "first_name": f"First{index}",
+            "last_name": f"Last{index}",
+            "phone_number": f"55500{index:05d}",
+            "address": f"{index} Pool Lane",
+            "job_title": "Estimator",
+            "permissions": permission_mask(
+                {
+                    "sales_marketing": index % 2 == 0,
+                    "project_management": index % 3 == 0,
+                    "access_other_users": False,
+                    "view_admin_panel": index % 10 == 0,
+                }
+            ),
+            "email": f"user{index}@example.com",
+            "role": "onboarded_user",
+            "country_code": "+1",
+            "phone_verified": index % 4 != 0,
+            "created_at": created + timedelta(minutes=index),
+            "onboarded_at": created + timedelta(minutes=index, seconds=30),
+        }
+        rows.append(tuple(values[name] for name in FIELDS))
+    return rows
+
+
+def _before(rows: list[tuple]) -> bytes:
+    # ORM entity -> validated UserResponse -> response_model validation ->
+    # jsonable_encoder -> stdlib json, as GET /api/users used to do.
+    entries = [
+        _entry(row, permissions=permission_dict(row[_PERMISSIONS])) for row in rows
+    ]
+    users = [
+        UserResponse(
+            id=entry.id,
+            first_name=entry.first_name,
+            last_name=entry.last_name,
+            phone_number=entry.phone_number,
+            address=entry.address,
+            job_title=entry.job_title,
+            permissions=PermissionFlags(**(entry.permissions or {})),
+            email=entry.email,
+            role=entry.role or "onboarded_user",
+            country_code=entry.country_code,
+            phone_verified=bool(entry.phone_verified),
+            created_at=entry.created_at,
+            onboarded_at=entry.onboarded_at,
+        )
+        for entry in entries
+    ]
+    validated = _RESPONSE_ADAPTER.validate_python(
+        [user.model_dump() for user in users]
+    )
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def _after(rows: list[tuple]) -> bytes:
+    return FastJSONResponse([_project_row(FIELDS, row) for row in rows]).body
+
+
+def _construct_only(rows: list[tuple]) -> int:
+    # Single-user endpoints: UserStore._to_response via model_construct.
+    entries = [_entry(row, permission_bits=row[_PERMISSIONS]) for row in rows]
+    return len([user_store._to_response(entry) for entry in entries])
+
+
+_RESPONSE_ADAPTER = TypeAdapter(list[UserResponse])
+
+
+def _measure(fn: Callable[[list[tuple]], object], rows: list[tuple], repeat: int) -> float:
+    fn(rows)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best / len(rows) * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-row cost of GET /api/users serialization"
+    )
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    assert _before(rows[:5]).count(b'"id"') == _after(rows[:5]).count(b'"id"')
+    before = _measure(_before, rows, args.repeat)
+    after = _measure(_after, rows, args.repeat)
+    construct = _measure(_construct_only, rows, args.repeat)
+    print(f"rows={args.rows} repeat={args.repeat} orjson={'yes' if orjson else 'no'}")
+    print(f"before  {before:8.2f} us/row")
+    print(f"after   {after:8.2f} us/row  ({before / after:.1f}x)")
+    print(f"model_construct (single-user responses)  {construct:8.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+# Hot-path microbenchmarks: JWT access tokens, OTP and session stores, user
+# provisioning and listing, response building and UserCreate validation.
+# Runs against DATABASE_URL (Postgres) or, with --sqlite, an embedded SQLite
+# file. All writes happen inside one transaction that is rolled back, so the
+# database is left as it was. Timings are per call; compare a run against a
+# saved one with --baseline (exit status 1 on regressions).
+#
+#     python -m benchmarks.suite --sqlite --output baseline.json
+#     python -m benchmarks.suite --sqlite --baseline baseline.json
+#     python -m benchmarks.suite --sizes 1000,10000,100000 --filter users.
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-not-for-production-use")
+
+_PAGES = ("first_page", "filtered", "deep_page")
+
+
+class Runner:
+    def __init__(self, repeat: int, min_time: float, name_filter: str) -> None:
+        self._repeat = repeat
+        self._min_time = min_time
+        self._filter = name_filter
+        self.results: dict[str, dict[str, Any]] = {}
+
+    def wants(self, name: str) -> bool:
+        return self._filter in name
+
+    def bench(
+        self,
+        name: str,
+        fn: Callable[[], object],
+        setup: Optional[Callable[[int], object]] = None,
+        after_round: Optional[Callable[[], object]] = None,
+    ) -> None:
+        # setup(number) runs untimed before each round, e.g. to issue the OTP
+        # codes that the round then verifies.
+        if not self.wants(name):
+            return
+
+        def run(number: int) -> float:
+            if setup is not None:
+                setup(number)
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - started
+            if after_round is not None:
+                after_round()
+            return elapsed
+
+        number = 1
+        while number < 1_000_000 and run(number) < self._min_time:
+            number *= 2
+        timings = [run(number) / number for _ in range(self._repeat)]
+        result = {
+            "median_us": statistics.median(timings) * 1_000_000,
+            "min_us": min(timings) * 1_000_000,
+            "stdev_us": statistics.pstdev(timings) * 1_000_000,
+            "number": number,
+            "repeat": self._repeat,
+        }
+        self.results[name] = result
+        print(
+            f"{name:<44} {result['median_us']:>11.2f} us"
+            f"  (min {result['min_us']:.2f}, x{number})",
+            flush=True,
+        )
+
+
+def _configure_database(sqlite_path: Optional[str]) -> None:
+    # app.config loads .env with override=True, so DATABASE_URL is set again
+    # afterwards; app.database reads it on import.
+    import app.config  # noqa: F401
+
+    if sqlite_path is not None:
+        os.environ["DATABASE_URL"] = f"sqlite:///{sqlite_path}"
+    elif not os.getenv("DATABASE_URL"):
+        raise SystemExit("DATABASE_URL is not set; pass --sqlite to use SQLite")
+
+
+def _tag_loaded_datetimes_utc() -> None:
+    # SQLite has no timestamptz; stores compare loaded values with aware
+    # datetimes, as they get them from Postgres.
+    from sqlalchemy import DateTime, event
+
+    from app.database import Base
+
+    @event.listens_for(Base, "load", propagate=True)
+    def _utc(target: Any, context: Any) -> None:
+        for column in target.__table__.columns:
+            if not isinstance(column.type, DateTime):
+                continue
+            value = target.__dict__.get(column.key)
+            if value is not None and value.tzinfo is None:
+                target.__dict__[column.key] = value.replace(tzinfo=timezone.utc)
+
+
+def _pure(runner: Runner) -> None:
+    from app.models.user import UserEntry
+    from app.schemas.users import UserCreate
+    from app.services.tokens import create_access_token, decode_access_token
+    from app.services.users import user_store
+
+    from benchmarks.data import user_payloads, user_rows
+
+    token = create_access_token(42, "session-id")
+    runner.bench("tokens.create_access_token", lambda: create_access_token(42, "sid"))
+    runner.bench("tokens.decode_access_token", lambda: decode_access_token(token))
+
+    payloads = itertools.cycle(user_payloads(1000))
+    runner.bench(
+        "schemas.UserCreate.model_validate",
+        lambda: UserCreate.model_validate(next(payloads)),
+    )
+
+    entries = itertools.cycle(
+        [UserEntry(id=index, **row) for index, row in enumerate(user_rows(0, 1000), 1)]
+    )
+    runner.bench(
+        "users.UserStore._to_response", lambda: user_store._to_response(next(entries))
+    )
+
+
+def _otp(runner: Runner, session: Any) -> None:
+    from app.services.otp import MemoryOtpStore, OtpStore
+
+    counter = itertools.count()
+    for label, store, kwargs in (
+        ("otp", OtpStore(300, 6), {"session": session}),
+        ("otp.memory", MemoryOtpStore(300, 6, 16), {}),
+    ):
+        runner.bench(
+            f"{label}.request_otp",
+            lambda: store.request_otp(
+                f"otp-{next(counter)}@example.invalid", "login", **kwargs
+            ),
+        )
+        issued: deque = deque()
+
+        def issue(number: int) -> None:
+            for _ in range(number):
+                identifier = f"otp-{next(counter)}@example.invalid"
+                issued.append(
+                    (identifier, store.request_otp(identifier, "login", **kwargs).code)
+                )
+
+        def verify() -> None:
+            identifier, code = issued.popleft()
+            if not store.verify_otp(identifier, "login", code, **kwargs):
+                raise RuntimeError("OTP benchmark code did not verify")
+
+        runner.bench(f"{label}.verify_otp", verify, setup=issue)
+
+
+def _sessions(runner: Runner, session: Any, user_id: int) -> None:
+    from app.services.cache import TTLCache
+    from app.services.sessions import SessionStore
+
+    cached = SessionStore(TTLCache(10_000, 60))
+    uncached = SessionStore(TTLCache(0, 0))
+
+    def create() -> None:
+        cached.create_session(user_id, session=session)
+        session.flush()
+
+    runner.bench("sessions.create_session", create, after_round=session.expunge_all)
+    token = cached.create_session(user_id, session=session)
+    session.flush()
+    runner.bench(
+        "sessions.get_user_id.cached",
+        lambda: cached.get_user_id(token, session=session),
+    )
+    runner.bench(
+        "sessions.get_user_id.uncached",
+        lambda: uncached.get_user_id(token, session=session),
+        after_round=session.expunge_all,
+    )
+
+
+def _uncached_user_store() -> Any:
+    from app.services.cache import TTLCache
+    from app.services.search import MemoryUserSearchIndex
+    from app.services.users import UserCache, UserStore
+
+    return UserStore(
+        UserCache(users=TTLCache(0, 0), pages=TTLCache(0, 0)),
+        MemoryUserSearchIndex(0),
+    )
+
+
+def _ensure_user(runner: Runner, session: Any, store: Any) -> int:
+    counter = itertools.count()
+    entry, _ = store.ensure_user_for_identifier(
+        "existing@example.invalid", session=session
+    )
+    runner.bench(
+        "users.ensure_user_for_identifier.existing",
+        lambda: store.ensure_user_for_identifier(
+            "existing@example.invalid", session=session
+        ),
+        after_round=session.expunge_all,
+    )
+    runner.bench(
+        "users.ensure_user_for_identifier.new",
+        lambda: store.ensure_user_for_identifier(
+            f"new-{next(counter)}@example.invalid", session=session
+        ),
+        after_round=session.expunge_all,
+    )
+    return entry.id
+
+
+def _list_users(
+    runner: Runner, session: Any, store: Any, sizes: list[int], page_size: int
+) -> None:
+    from sqlalchemy import func, insert, select, text
+
+    from app.models.user import UserEntry
+    from app.services.users import UserFilters
+
+    from benchmarks.data import user_rows
+
+    inserted = 0
+    for size in sorted(sizes):
+        if not any(runner.wants(f"users.list_users.{size}.{case}") for case in _PAGES):
+            continue
+        started = time.perf_counter()
+        while inserted < size:
+            batch = list(user_rows(inserted, min(5000, size - inserted)))
+            session.execute(insert(UserEntry), batch)
+            inserted += len(batch)
+        session.execute(text("ANALYZE users"))
+        print(
+            f"# users: {inserted} synthetic rows"
+            f" ({time.perf_counter() - started:.1f}s to generate)",
+            flush=True,
+        )
+        total = session.scalar(select(func.count(UserEntry.id)))
+        middle = session.scalar(
+            select(UserEntry.id).order_by(UserEntry.id).offset(total // 2).limit(1)
+        )
+        pages = {
+            "first_page": {},
+            "filtered": {
+                "filters": UserFilters(onboarded=True, permissions=("sales_marketing",))
+            },
+            "deep_page": {"after": middle},
+        }
+        for case in _PAGES:
+            runner.bench(
+                f"users.list_users.{size}.{case}",
+                lambda kwargs=pages[case]: store.list_users(
+                    limit=page_size, session=session, **kwargs
+                ),
+            )
+
+
+def _database(runner: Runner, args: argparse.Namespace) -> str:
+    from sqlalchemy.orm import Session
+
+    from app.database import Base, engine, init_db
+
+    init_db()
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+        _tag_loaded_datetimes_utc()
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        session = Session(
+            bind=connection,
+            autoflush=False,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            store = _uncached_user_store()
+            _otp(runner, session)
+            user_id = _ensure_user(runner, session, store)
+            _sessions(runner, session, user_id)
+            _list_users(runner, session, store, args.sizes, args.page_size)
+        finally:
+            session.close()
+            transaction.rollback()
+    return engine.dialect.name
+
+
+def _metadata(database: str, args: argparse.Namespace) -> dict[str, Any]:
+    import sqlalchemy
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "database": database,
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "machine": platform.machine(),
+        "sizes": args.sizes,
+        "page_size": args.page_size,
+    }
+
+
+def _compare(
+    results: dict[str, dict[str, Any]], baseline_path: str, tolerance: float
+) -> bool:
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    meta = baseline.get("meta", {})
+    print(
+        f"\nvs {baseline_path} (commit {meta.get('commit')},"
+        f" {meta.get('database')}; tolerance {tolerance:.0%})"
+    )
+    regressed = False
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:<44} {'new':>11}")
+            continue
+        ratio = result["median_us"] / before["median_us"]
+        if ratio > 1 + tolerance:
+            verdict = "REGRESSED"
+            regressed = True
+        elif ratio < 1 - tolerance:
+            verdict = "faster"
+        else:
+            verdict = ""
+        print(
+            f"{name:<44} {before['median_us']:>11.2f} -> {result['median_us']:.2f} us"
+            f"  {ratio:5.2f}x {verdict}"
+        )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="use an embedded SQLite file (a temporary one by default)",
+    )
+    parser.add_argument("--no-db", action="store_true", help="skip store benchmarks")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[1000, 10_000, 100_000],
+        help="users in the table for list_users (comma separated)",
+    )
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--min-time", type=float, default=0.05, help="seconds per timed round"
+    )
+    parser.add_argument("--filter", default="", help="only names containing this")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare with a saved --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sqlite_path = args.sqlite
+    if sqlite_path == "":
+        sqlite_path = os.path.join(tempfile.mkdtemp(prefix="benchmark-"), "users.db")
+    if args.no_db:
+        os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+    else:
+        _configure_database(sqlite_path)
+
+    runner = Runner(args.repeat, args.min_time, args.filter)
+    _pure(runner)
+    database = "none" if args.no_db else _database(runner, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"meta": _metadata(database, args), "results": runner.results},
+                handle,
+                indent=2,
+            )
+        print(f"\nwrote {args.output}")
+    if args.baseline and _compare(runner.results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+-- Supports the batched expired-session cleanup in app/services/cleanup.py.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_auth_sessions_expires_at
+    ON auth_sessions (expires_at);
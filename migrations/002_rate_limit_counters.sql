@@ -0,0 +1,10 @@
+-- Shared fixed-window counters for RATE_LIMIT_BACKEND=postgres.
+CREATE TABLE IF NOT EXISTS rate_limit_counters (
+    key VARCHAR(255) PRIMARY KEY,
+    window_start TIMESTAMPTZ NOT NULL,
+    count INTEGER NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_rate_limit_counters_expires_at
+    ON rate_limit_counters (expires_at);
@@ -0,0 +1,21 @@
+-- Supports the filtered, keyset-paginated GET /api/users (ORDER BY id).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_role_id
+    ON users (role, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_phone_verified_id
+    ON users (phone_verified, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_onboarded_id
+    ON users (id) WHERE onboarded_at IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_perm_sales_marketing_id
+    ON users (id) WHERE (permissions ->> 'sales_marketing') = 'true';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_perm_project_management_id
+    ON users (id) WHERE (permissions ->> 'project_management') = 'true';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_perm_access_other_users_id
+    ON users (id) WHERE (permissions ->> 'access_other_users') = 'true';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_perm_view_admin_panel_id
+    ON users (id) WHERE (permissions ->> 'view_admin_panel') = 'true';
@@ -0,0 +1,11 @@
+-- Only needed with USER_SEARCH_BACKEND=postgres (GET /api/users/search).
+-- The indexed expression must match PostgresUserSearch in app/services/search.py.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_search_trgm
+    ON users USING gin (
+        lower(
+            coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' '
+            || coalesce(email, '') || ' ' || coalesce(phone_number, '')
+        ) gin_trgm_ops
+    );
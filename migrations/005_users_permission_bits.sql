@@ -0,0 +1,54 @@
+-- Permissions as an integer bitmask (bit i = PERMISSION_FLAGS[i] in
+-- app/models/user.py): sales_marketing=1, project_management=2,
+-- access_other_users=4, view_admin_panel=8.
+-- Run before deploying the release that reads permission_bits. The backfill
+-- only touches rows whose mask is out of date, so re-run it once the rollout
+-- finishes to pick up rows written by the previous release in between.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS permission_bits integer NOT NULL DEFAULT 0;
+
+DO $$
+DECLARE
+    batch_start integer := 0;
+    max_id integer;
+BEGIN
+    SELECT coalesce(max(id), 0) INTO max_id FROM users;
+    WHILE batch_start <= max_id LOOP
+        UPDATE users
+        SET permission_bits = computed.bits
+        FROM (
+            SELECT
+                id,
+                (CASE WHEN (permissions ->> 'sales_marketing') = 'true' THEN 1 ELSE 0 END)
+                | (CASE WHEN (permissions ->> 'project_management') = 'true' THEN 2 ELSE 0 END)
+                | (CASE WHEN (permissions ->> 'access_other_users') = 'true' THEN 4 ELSE 0 END)
+                | (CASE WHEN (permissions ->> 'view_admin_panel') = 'true' THEN 8 ELSE 0 END)
+                    AS bits
+            FROM users
+            WHERE id > batch_start AND id <= batch_start + 10000
+        ) AS computed
+        WHERE users.id = computed.id
+            AND users.permission_bits IS DISTINCT FROM computed.bits;
+        COMMIT;
+        batch_start := batch_start + 10000;
+    END LOOP;
+END
+$$;
+
+-- One partial index per flag for ?permission= / ?any_permission= filters.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_permbit_sales_marketing_id
+    ON users (id) WHERE (permission_bits & 1) <> 0;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_permbit_project_management_id
+    ON users (id) WHERE (permission_bits & 2) <> 0;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_permbit_access_other_users_id
+    ON users (id) WHERE (permission_bits & 4) <> 0;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_permbit_view_admin_panel_id
+    ON users (id) WHERE (permission_bits & 8) <> 0;
+
+-- The JSON expression indexes from 003 are no longer used.
+DROP INDEX CONCURRENTLY IF EXISTS ix_users_perm_sales_marketing_id;
+DROP INDEX CONCURRENTLY IF EXISTS ix_users_perm_project_management_id;
+DROP INDEX CONCURRENTLY IF EXISTS ix_users_perm_access_other_users_id;
+DROP INDEX CONCURRENTLY IF EXISTS ix_users_perm_view_admin_panel_id;